@@ -23,4 +23,6 @@ Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
 __version__ = '1.1.4'
 
 from .mainclass import MainClass
-from .solver import solve_sle
\ No newline at end of file
+from .solver import solve_sle, solve_img_dist
+from .lut import DepthLUT
+from .records import CameraParams, RefoResult, TriaResult
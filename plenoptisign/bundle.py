@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+__author__ = "Christopher Hahne"
+__email__ = "inbox@christopherhahne.de"
+__license__ = """
+Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import numpy as np
+
+from .records import CameraParams, RayBundle
+from .solver import solve_img_dist
+from .refo import refo_vec, _rays
+from .constants import PlenoptisignError
+
+
+def ray_bundle(data=None, axis=0, lenses=None, pixels=None):
+    """
+
+    This function traces the chief rays of every pixel under every micro lens along one sensor dimension with the
+    geometry of :func:`refo()`, i.e. micro lens :math:`j` at :math:`s_j = j \\times p_m` and pixel :math:`i` at
+    :math:`u_{i,j} = c_j + i \\times p_p` relative to its micro image centre :math:`c_j`. By default, micro lens
+    indices are centred on the optical axis and cover the sensor dimension :math:`sd` while :math:`M` pixels (rounded)
+    are centred under each micro lens.
+
+    :param data: dictionary of input parameters or :class:`CameraParams` (see :class:`MainClass`)
+    :param axis: sensor dimension of :math:`sd` along which micro lenses are placed
+    :param lenses: micro lens indices :math:`j` (all across sensor if None)
+    :param pixels: pixel indices :math:`i` relative to micro image centre (all under micro lens if None)
+    :type data: dict
+    :type axis: int
+    :type lenses: :class:`~numpy:numpy.ndarray`
+    :type pixels: :class:`~numpy:numpy.ndarray`
+
+    :return: **s**, **u**, **mij**, **Uij**, **qij** of shape (len(lenses), len(pixels))
+    :rtype: :class:`RayBundle` of :class:`~numpy:numpy.ndarray`
+
+    """
+
+    p = CameraParams.coerce(data)
+    bU = float(solve_img_dist(p.df, p.fU, p.HH)[0])
+
+    j = lens_indices(p, axis) if lenses is None else np.asarray(lenses, dtype=float)
+    i = pixel_indices(p) if pixels is None else np.asarray(pixels, dtype=float)
+
+    return _bundle(p, bU, j, i)
+
+
+def iter_ray_bundle(data=None, axis=0, chunk_size=2**20):
+    """
+
+    This function is a generator of :func:`ray_bundle()` in chunks of consecutive micro lenses so that the bundle of
+    a whole sensor may be streamed where it does not fit in memory. If axis is None, rays cover both sensor
+    dimensions and fields have shape (rows, lenses, pixels, pixels, 2) with rows of micro lenses along the first and
+    lenses along the second dimension. The last axis holds the components along both dimensions of the separable
+    paraxial model.
+
+    :param data: dictionary of input parameters or :class:`CameraParams` (see :class:`MainClass`)
+    :param axis: sensor dimension of :math:`sd` along which micro lenses are placed or None for both
+    :param chunk_size: maximum number of rays per chunk (at least one row of micro lenses)
+    :type data: dict
+    :type axis: int
+    :type chunk_size: int
+
+    :return: **sl** slicing micro lenses (of first dimension) and **bundle** of the chunk
+    :rtype: tuple of slice and :class:`RayBundle`
+
+    Usage example::
+
+        >> for sl, bundle in iter_ray_bundle({'df': 2000}, axis=None):
+        >>     out[sl] = bundle.qij
+
+    """
+
+    if chunk_size < 1:
+        raise PlenoptisignError('Chunk size %s is not positive' % chunk_size)
+
+    p = CameraParams.coerce(data)
+    bU = float(solve_img_dist(p.df, p.fU, p.HH)[0])
+
+    i = pixel_indices(p)
+    j = lens_indices(p, 0 if axis is None else axis)
+
+    # second dimension is traced once and combined with each chunk of the first
+    cols = None
+    if axis is None:
+        cols = RayBundle(*[arr[None, :, None, :] for arr in _bundle(p, bU, lens_indices(p, 1), i)])
+
+    # number of micro lenses per chunk
+    rays_per_row = i.size if cols is None else i.size**2 * cols.s.shape[1]
+    rows = max(1, chunk_size // max(rays_per_row, 1))
+
+    for start in range(0, j.size, rows):
+        sl = slice(start, min(start+rows, j.size))
+        chunk = _bundle(p, bU, j[sl], i)
+        if cols is not None:
+            chunk = RayBundle(*[np.stack(np.broadcast_arrays(arr[:, None, :, None], col), axis=-1)
+                                for arr, col in zip(chunk, cols)])
+        yield sl, chunk
+
+
+def refo_field(data=None, axis=0, outputs=None):
+    """
+
+    This function computes the refocusing distance :math:`d_a` and depth of field borders :math:`d_{a\\pm }` for
+    every micro lens across the sensor in one vectorized pass of :func:`refo_vec()`. Other than :func:`refo()`, the
+    intersecting rays are aligned around each micro lens instead of the optical axis. If axis is None, micro lenses
+    cover both sensor dimensions and each one is evaluated in its meridional plane, i.e. at its radial distance from
+    the optical axis.
+
+    :param data: dictionary of input parameters or :class:`CameraParams` (see :class:`MainClass`)
+    :param axis: sensor dimension of :math:`sd` along which micro lenses are placed or None for both
+    :param outputs: names of requested result fields where None requests all
+    :type data: dict
+    :type axis: int
+    :type outputs: iterable of str
+
+    :return: **d**, **d_p**, **d_m**, **dof** of shape (lenses,) or (lenses, lenses) for both dimensions
+    :rtype: :class:`RefoResult` of :class:`~numpy:numpy.ndarray`
+
+    .. note::
+        In the paraxial model, refocused planes are flat so that distances are constant across the sensor up to
+        rounding errors whereas the lateral position of the intersection follows the micro lens.
+
+    """
+
+    p = CameraParams.coerce(data)
+    bU = float(solve_img_dist(p.df, p.fU, p.HH)[0])
+
+    # micro lens index offsets from optical axis
+    if axis is None:
+        offset = np.hypot(*np.meshgrid(lens_indices(p, 0), lens_indices(p, 1), indexing='ij'))
+    else:
+        offset = lens_indices(p, axis)
+
+    return refo_vec(p.a, bU, p.M, p.pm, p.pp, p.fs, p.dA, p.fU, p.HH, outputs, offset)
+
+
+def lens_indices(data=None, axis=0):
+    """ micro lens indices centred on the optical axis covering sensor dimension :math:`sd` at given axis """
+
+    p = CameraParams.coerce(data)
+    n = int(p.sd[axis] // p.pm)
+
+    return np.arange(n) - (n-1)/2
+
+
+def pixel_indices(data=None):
+    """ pixel indices centred under a micro lens for the rounded micro image diameter :math:`M` """
+
+    p = CameraParams.coerce(data)
+    n = int(round(p.M))
+
+    return np.arange(n) - (n-1)/2
+
+
+def _bundle(p, bU, j, i):
+    ''' chief rays for all combinations of micro lens indices j and pixel indices i '''
+
+    rays = _rays(j[:, None], i[None, :], p.pm, p.pp, p.fs, p.dA, bU, p.fU)
+
+    return RayBundle(*[np.ascontiguousarray(arr) for arr in np.broadcast_arrays(*rays)])
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+__author__ = "Christopher Hahne"
+__email__ = "inbox@christopherhahne.de"
+__license__ = """
+Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """ The LRUCache is a bounded mapping which discards the least recently used entry once full.
+
+    :param maxsize: maximum number of stored entries
+    :type maxsize: int
+
+    """
+
+    def __init__(self, maxsize=32):
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        ''' return stored value and mark it as recently used or None if key is absent '''
+
+        if key in self._data:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+        self.misses += 1
+
+        return None
+
+    def put(self, key, value):
+        ''' store value and discard least recently used entry if maximum size is exceeded '''
+
+        if self.maxsize > 0:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+        return True
+
+    def clear(self):
+        ''' remove all entries and reset counters '''
+
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+        return True
+
+    def __len__(self):
+        return len(self._data)
@@ -1,9 +1,41 @@
 # -*- coding: utf-8 -*-
 
+from enum import IntFlag
+
+
 class PlenoptisignError(Exception):
     def __init__(self, *args, **kwargs):
         Exception.__init__(self, *args, **kwargs)
 
+
+class Flag(IntFlag):
+    """ Warning flags of :func:`refo()`, :func:`tria()` and :func:`compute_img_dist()` which are combined bitwise and
+    stored as uint16 per element in batches. Console messages are only rendered on demand (see :func:`render()`). """
+
+    OK = 0
+    OBJ_DIST = 1        # object distance smaller than image distance
+    IMG_DIST = 2        # image distance smaller than focal length
+    SLICE_RANGE = 4     # refocusing slice out of range
+    PLANE_INF = 8       # refocused object plane at infinity
+    PLANE_RANGE = 16    # refocused object plane beyond infinity
+
+    def render(self, a=None):
+        ''' console message of the flag with highest precedence where shift parameter a completes the text '''
+
+        for flag, text in FLAG_MSGS:
+            if self & flag:
+                return text % a if '%' in text else text
+
+        return ''
+
+
+# console messages in order of precedence
+FLAG_MSGS = [(Flag.PLANE_RANGE, 'Refocused object plane a=%0.1f out of range'),
+             (Flag.PLANE_INF, 'Refocused object plane a=%0.1f at infinity'),
+             (Flag.IMG_DIST, 'Image distance is smaller than focal length'),
+             (Flag.SLICE_RANGE, 'Refocusing slice a %0.1f is out of range'),
+             (Flag.OBJ_DIST, 'Object distance smaller than image distance')]
+
 # default values
 VALS = [(24.048, 36.072), .009, 2.75, .396, .125, 111.0324, 193.2935, -65.5563, 4000, 22., 1.0, 13.9523, -6, 4.0]
 # notation characters
@@ -12,6 +44,8 @@ EXPR = ['Sensor Dimensions (Y,X)', 'Pixel Pitch', 'Micro Lens Focal Length', 'Mi
         'Micro Lens Pitch', 'Exit Pupil Distance', 'Main Lens Focal Length',
         'Main Lens Principal Plane Spacing', 'Main Lens Focusing Distance', 'F-number',
         'Shift Parameter', 'Micro Image Resolution', 'Virtual Camera Gap', 'Disparity']
+# result notation characters
+RABB = ['d', 'd_p', 'd_m', 'dof', 'B', 'phi', 'Z']
 RSLT = ['Refocusing Distance', 'Far DoF Border', 'Narrow DoF Border', 'Depth of Field',
         'Baseline', 'Tilt Angle', 'Triangulation Distance']
 
@@ -0,0 +1,531 @@
+#!/usr/bin/env python
+
+__author__ = "Christopher Hahne"
+__email__ = "inbox@christopherhahne.de"
+__license__ = """
+Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+from collections import namedtuple
+import numbers
+import math
+
+import numpy as np
+
+from .records import CameraParams, RefoResult, TriaResult, select, pick
+from .constants import PlenoptisignError, Flag, RABB, DEC_P
+
+
+class RefoState(namedtuple('RefoState', ['d', 'd_p', 'd_m', 'dof', 'bU', 'aU', 'flags', 'sc', 'uc', 'u', 's', 'Uij',
+                                         'Fij', 'uU', 'uL', 'sU', 'sL', 'UijU', 'UijL'])):
+    """ The RefoState is the immutable outcome of :func:`refo()` comprising results, warning flags and the ray
+    intermediates required for plotting. Ray intermediates are immutable tuples. """
+
+    __slots__ = ()
+
+    @property
+    def result(self):
+        return RefoResult(self.d, self.d_p, self.d_m, self.dof)
+
+
+class TriaState(namedtuple('TriaState', ['B', 'phi', 'Z', 'bU', 'aU', 'flags', 'u0', 'mij', 'Uij', 'qij', 'intersect',
+                                         'ent_pup_pos', 'pp_new'])):
+    """ The TriaState is the immutable outcome of :func:`tria()` comprising results, warning flags and the ray
+    intermediates required for plotting. Ray intermediates are immutable tuples. """
+
+    __slots__ = ()
+
+    @property
+    def result(self):
+        return TriaResult(self.B, self.phi, self.Z)
+
+
+def refo(params, validate=True, outputs=None):
+    """
+
+    This function computes the distance :math:`d_a` and depth of field limits :math:`d_{a\\pm }` of a plane that is
+    computationally focused based on a standard plenoptic camera. Other than :func:`MainClass.refo()`, it only
+    depends on its argument and allocates all intermediates locally so that a single parameter record may be
+    evaluated from many threads at once. It is evaluated by the scalar engine :func:`refo_scalar()`.
+
+    :param params: camera parameters
+    :param validate: compare object and image side intersections of requested distances and raise an error on mismatch
+    :param outputs: requested fields of :class:`RefoResult` where others are None and skipped if possible
+    :type params: :class:`CameraParams` or dict
+    :type validate: bool
+    :type outputs: tuple
+
+    :return: **state**
+    :rtype: :class:`RefoState`
+
+    """
+
+    return refo_scalar(params, validate, outputs)
+
+
+def tria(params, validate=True, outputs=None):
+    """
+
+    This function computes depth plane distance :math:`Z_{(G, \\Delta x)}`, virtual camera tilt :math:`\\Phi_G`
+    and baseline :math:`B_G` of a standard plenoptic camera. Other than :func:`MainClass.tria()`, it only depends on
+    its argument and allocates all intermediates locally so that a single parameter record may be evaluated from many
+    threads at once. It is evaluated by the scalar engine :func:`tria_scalar()`.
+
+    :param params: camera parameters
+    :param validate: cross-check baseline if computed and raise an error on mismatch
+    :param outputs: requested fields of :class:`TriaResult` where others are None and skipped if possible
+    :type params: :class:`CameraParams` or dict
+    :type validate: bool
+    :type outputs: tuple
+
+    :return: **state**
+    :rtype: :class:`TriaState`
+
+    """
+
+    return tria_scalar(params, validate, outputs)
+
+
+def refo_scalar(params, validate=True, outputs=None):
+    """
+
+    This function is the scalar engine of :func:`refo()`. It yields a :class:`RefoState` while operating on
+    plain Python floats only, i.e. rays are intersected in closed form (see :func:`_intersect()`) and no array is
+    allocated. Ray intermediates are thus immutable tuples. It requires scalar parameters (see :func:`is_scalar()`).
+    The evaluation is composed of the stages :func:`img_dist_scalar()`, :func:`refo_rays()` and
+    :func:`refo_intersect()`.
+
+    :param params: camera parameters
+    :param validate: compare object and image side intersections of requested distances and raise an error on mismatch
+    :param outputs: requested fields of :class:`RefoResult` where others are None and skipped if possible
+    :type params: :class:`CameraParams` or dict
+    :type validate: bool
+    :type outputs: tuple
+
+    :return: **state**
+    :rtype: :class:`RefoState`
+
+    """
+
+    p = CameraParams.coerce(params)
+
+    # distances required for requested outputs
+    out = select(outputs, RefoResult)
+    need = out | {'d_p', 'd_m'} if 'dof' in out else out
+
+    img = img_dist_scalar(p)
+    rays = refo_rays(p, img[0], borders='d_p' in need or 'd_m' in need)
+
+    return refo_intersect(p, img, rays, validate, out)
+
+
+def refo_rays(p, bU, borders=True):
+    """
+
+    This function is the ray tracing stage of :func:`refo_scalar()` providing chief rays and optionally pixel border
+    rays of both micro lenses for the main lens image distance :math:`b_U`.
+
+    :param p: camera parameters
+    :param bU: main lens image distance
+    :param borders: trace pixel border rays required for depth of field borders
+    :type p: :class:`CameraParams`
+    :type bU: float
+    :type borders: bool
+
+    :return: **s**, **uc**, **u**, **mij**, **Uij**, **Fij**, **qij** and **uU**, **uL**, **sU**, **sL**, **mijU**,
+        **mijL**, **UijU**, **UijL**, **qijU**, **qijL** (None without borders) as pairs of floats
+    :rtype: tuple
+
+    """
+
+    # align intersection to be as paraxial as possible (rounding half to even as in numpy)
+    c = (p.M-1)/2
+    j0 = -round(p.a*(p.M-1)/2*10**DEC_P)/10**DEC_P
+    j1 = p.a*(p.M-1)+j0
+
+    # chief rays of both micro lenses
+    s, uc, u, mij, Uij, Fij, qij = zip(_ray(j0, c, bU, p), _ray(j1, -c, bU, p))
+
+    # pixel border rays of both micro lenses
+    border = (None,)*10
+    if borders:
+        border = tuple(zip(_border_ray(s[0], u[0], bU, p), _border_ray(s[1], u[1], bU, p)))
+
+    return (s, uc, u, mij, Uij, Fij, qij) + border
+
+
+def refo_intersect(p, img, rays, validate=True, outputs=None):
+    """
+
+    This function is the intersection stage of :func:`refo_scalar()` solving for the refocusing distance and depth of
+    field borders from the main lens image distance record and the rays of :func:`refo_rays()`.
+
+    :param p: camera parameters
+    :param img: **bU**, **aU**, **flags** (see :func:`img_dist_scalar()`)
+    :param rays: rays of :func:`refo_rays()`
+    :param validate: compare object and image side intersections of requested distances and raise an error on mismatch
+    :param outputs: requested fields of :class:`RefoResult` where others are None and skipped if possible
+    :type p: :class:`CameraParams`
+    :type img: tuple
+    :type rays: tuple
+    :type validate: bool
+    :type outputs: tuple
+
+    :return: **state**
+    :rtype: :class:`RefoState`
+
+    """
+
+    # distances required for requested outputs
+    out = select(outputs, RefoResult)
+    need = out | {'d_p', 'd_m'} if 'dof' in out else out
+
+    bU, aU, flags = img
+    s, uc, u, mij, Uij, Fij, qij, uU, uL, sU, sL, mijU, mijL, UijU, UijL, qijU, qijL = rays
+
+    # (s,u) coordinates for the intersecting rays
+    smax = 2*p.M+1
+    sc = (smax-1)/2
+
+    # warnings
+    if p.fU > bU:
+        flags |= Flag.IMG_DIST
+    if p.a >= (smax-1)/2:
+        flags |= Flag.SLICE_RANGE
+
+    # ray intersection behind image sensor
+    b_new = bU-_intersect(mij[0], mij[1], s[0], s[1])[0]
+
+    d, d_p, d_m, dof = [float('inf')]*4
+    d_n, d_p_n, d_m_n = [float('inf')]*3
+
+    # is refocused object plane not at infinity?
+    finite = bU >= p.fU and b_new > p.fU
+    if finite:
+        # solve for ray intersections in object space to obtain distance and compare with refocused image side plane
+        if 'd' in need:
+            d = _intersect(qij[0], qij[1], Uij[0], Uij[1])[0]+bU+p.HH
+            d_n = _obj_dist(b_new, p.fU)+bU+p.HH if validate else d
+    # is refocused object plane at infinity?
+    elif b_new == p.fU:
+        flags |= Flag.PLANE_INF
+    # is refocused object plane beyond infinity?
+    else:
+        flags |= Flag.PLANE_RANGE
+
+    # is far depth of field border not at infinity?
+    if 'd_p' in need:
+        b_new_p = bU-_intersect(mijU[0], mijL[1], sU[0], sL[1])[0]
+        if b_new_p > p.fU:
+            d_p = _intersect(qijU[0], qijL[1], UijU[0], UijL[1])[0]+bU+p.HH
+            d_p_n = _obj_dist(b_new_p, p.fU)+bU+p.HH if validate else d_p
+
+    # is narrow depth of field border not at infinity?
+    if 'd_m' in need:
+        b_new_m = bU-_intersect(mijL[0], mijU[1], sL[0], sU[1])[0]
+        if finite or b_new_m > p.fU:
+            d_m = _intersect(qijL[0], qijU[1], UijL[0], UijU[1])[0]+bU+p.HH
+            d_m_n = _obj_dist(b_new_m, p.fU)+bU+p.HH if validate else d_m
+
+    if 'dof' in out:
+        dof = d_p-d_m if float('inf') not in (d_p, d_m) else float('inf')
+
+    # comparison of image and object side approach (for debugging purposes)
+    pairs = [(x, y) for key, x, y in zip(RABB, (d, d_p, d_m), (d_n, d_p_n, d_m_n)) if key in need]
+    if validate and not any(round(x, DEC_P) == round(y, DEC_P) for x, y in pairs):
+        raise PlenoptisignError('Results for object and image side intersections are different')
+
+    res = pick(RefoResult, out, (d, d_p, d_m, dof))
+
+    return RefoState(*res + (bU, aU, flags, sc, uc, u, s, Uij, Fij, uU, uL, sU, sL, UijU, UijL))
+
+
+def tria_scalar(params, validate=True, outputs=None):
+    """
+
+    This function is the scalar engine of :func:`tria()`. It yields a :class:`TriaState` while operating on
+    plain Python floats only, i.e. rays are intersected in closed form (see :func:`_intersect()`) and no array is
+    allocated. Ray intermediates are thus immutable tuples. It requires scalar parameters (see :func:`is_scalar()`).
+    The evaluation is composed of the stages :func:`img_dist_scalar()`, :func:`tria_view()` and
+    :func:`tria_triangulate()`.
+
+    :param params: camera parameters
+    :param validate: cross-check baseline if computed and raise an error on mismatch
+    :param outputs: requested fields of :class:`TriaResult` where others are None and skipped if possible
+    :type params: :class:`CameraParams` or dict
+    :type validate: bool
+    :type outputs: tuple
+
+    :return: **state**
+    :rtype: :class:`TriaState`
+
+    """
+
+    p = CameraParams.coerce(params)
+
+    img = img_dist_scalar(p)
+    view = tria_view(p, img[0], outputs)
+
+    return tria_triangulate(p, img, view, validate, outputs)
+
+
+def tria_view(p, bU, outputs=None):
+    """
+
+    This function is the viewpoint stage of :func:`tria_scalar()` locating the virtual camera of viewpoint gap
+    :math:`G` by its rays, baseline and tilt angle, which do not depend on the disparity.
+
+    :param p: camera parameters
+    :param bU: main lens image distance
+    :param outputs: requested fields of :class:`TriaResult` for which baseline and tilt angle are computed
+    :type p: :class:`CameraParams`
+    :type bU: float
+    :type outputs: tuple
+
+    :return: **u0**, **mij**, **Uij**, **qij**, **intersect**, **B**, **phi** where skipped values are None
+    :rtype: tuple
+
+    """
+
+    out = select(outputs, TriaResult)
+
+    # ray geometry calculation
+    s = p.pm
+    mc = -(s / p.dA)
+    uc = -mc * p.fs + s
+    u0 = uc + p.pp * p.G
+    mij = (-p.pp * p.G / p.fs, (s - u0) / p.fs)
+    Uij = (mij[0] * bU, mij[1] * bU + s)
+    qij = ((mij[0] * p.fU - Uij[0]) / p.fU, (mij[1] * p.fU - Uij[1]) / p.fU)
+
+    intersect, B, phi = [None]*3
+
+    if out & {'B', 'Z'}:
+        # locate object side related virtual camera position
+        intersect, B = _intersect(qij[0], qij[1], Uij[0], Uij[1])
+
+    if out & {'phi', 'Z'}:
+        # orientation of virtual camera
+        phi = math.degrees(math.atan(qij[0]))
+
+    return u0, mij, Uij, qij, intersect, B, phi
+
+
+def tria_triangulate(p, img, view, validate=True, outputs=None):
+    """
+
+    This function is the triangulation stage of :func:`tria_scalar()` computing the depth plane distance
+    :math:`Z_{(G, \\Delta x)}` from the main lens image distance record and the viewpoint of :func:`tria_view()`.
+
+    :param p: camera parameters
+    :param img: **bU**, **aU**, **flags** (see :func:`img_dist_scalar()`)
+    :param view: viewpoint of :func:`tria_view()`
+    :param validate: cross-check baseline if computed and raise an error on mismatch
+    :param outputs: requested fields of :class:`TriaResult` where others are None and skipped if possible
+    :type p: :class:`CameraParams`
+    :type img: tuple
+    :type view: tuple
+    :type validate: bool
+    :type outputs: tuple
+
+    :return: **state**
+    :rtype: :class:`TriaState`
+
+    """
+
+    out = select(outputs, TriaResult)
+
+    bU, aU, flags = img
+    u0, mij, Uij, qij, intersect, B, phi = view
+
+    Z, ent_pup_pos, pp_new = [None]*3
+
+    if out & {'B', 'Z'}:
+        # longitudinal entrance pupil position
+        ent_pup_pos = bU + p.HH + intersect
+
+        # validate baseline approach (for debug purposes)
+        if validate and round(B, DEC_P) != round(qij[0] * intersect + Uij[0], DEC_P):
+            raise PlenoptisignError('Baseline validation failed')
+
+    if 'Z' in out:
+        # triangulation
+        pp_new = (-qij[1] * bU + B) - (-qij[0] * bU + B)
+        dx_new = p.dx * pp_new
+
+        # is depth plane at infinity?
+        if bU <= p.fU and p.dx <= 0:
+            Z = float('inf')
+        elif bU >= p.fU:
+            Z = _div(B * bU, dx_new + bU * -math.tan(math.radians(phi)))
+        else:
+            Z = float('nan')
+
+    res = pick(TriaResult, out, (B, phi, Z))
+
+    return TriaState(*res + (bU, aU, flags, u0, mij, Uij, qij, intersect, ent_pup_pos, pp_new))
+
+
+def refo_analytic(params, outputs=None):
+    """
+
+    This function computes the same results as :func:`refo()` from the paraxial closed-form expressions of the
+    refocused image distances (see :func:`refo_ana_vec()`) and the thin lens equation instead of tracing and
+    intersecting rays. Ray intermediates for plotting are not provided and thus set to None in the returned record.
+
+    :param params: camera parameters
+    :param outputs: requested fields of :class:`RefoResult` where others are None and skipped
+    :type params: :class:`CameraParams` or dict
+    :type outputs: tuple
+
+    :return: **state**
+    :rtype: :class:`RefoState`
+
+    """
+
+    p = CameraParams.coerce(params)
+
+    # distances required for requested outputs
+    out = select(outputs, RefoResult)
+    need = out | {'d_p', 'd_m'} if 'dof' in out else out
+
+    # compute main lens image distance
+    bU, aU, flags = img_dist_scalar(p)
+
+    smax = 2*p.M+1
+    sc = (smax-1)/2
+
+    # warnings
+    if p.fU > bU:
+        flags |= Flag.IMG_DIST
+    if p.a >= (smax-1)/2:
+        flags |= Flag.SLICE_RANGE
+
+    # refocused image distance of chief rays as well as near and far pixel border rays
+    K = p.pm*p.fs/p.pp
+    T = p.a*(p.M-1)
+    b_new = bU + _div(K*T, p.M-1 - T*K/p.dA)
+
+    d, d_p, d_m, dof = [float('inf')]*4
+
+    # is refocused object plane not at infinity?
+    finite = bU >= p.fU and b_new > p.fU
+    if finite:
+        d = _obj_dist(b_new, p.fU)+bU+p.HH if 'd' in need else d
+    # is refocused object plane at infinity?
+    elif b_new == p.fU:
+        flags |= Flag.PLANE_INF
+    # is refocused object plane beyond infinity?
+    else:
+        flags |= Flag.PLANE_RANGE
+
+    # is far depth of field border not at infinity?
+    if 'd_p' in need:
+        b_new_p = bU + _div(K*(T-1), p.M - T*K/p.dA)
+        d_p = _obj_dist(b_new_p, p.fU)+bU+p.HH if b_new_p > p.fU else d_p
+
+    # is narrow depth of field border not at infinity?
+    if 'd_m' in need:
+        b_new_m = bU + _div(K*(T+1), p.M-2 - T*K/p.dA)
+        d_m = _obj_dist(b_new_m, p.fU)+bU+p.HH if finite or b_new_m > p.fU else d_m
+
+    if 'dof' in out:
+        dof = d_p-d_m if float('inf') not in (d_p, d_m) else float('inf')
+
+    return RefoState(*pick(RefoResult, out, (d, d_p, d_m, dof)) + (bU, aU, flags, sc) + (None,)*11)
+
+
+def is_scalar(params):
+    """ check if all parameters are real numbers (incl. numpy scalars) eligible for :func:`refo_scalar()` and
+    :func:`tria_scalar()` """
+
+    # plain numbers are checked first as abstract base classes are slow
+    return all(isinstance(val, (int, float)) or isinstance(val, numbers.Real)
+               for key, val in zip(params._fields, params) if key != 'sd')
+
+
+def img_dist_scalar(p):
+    ''' main lens image and object distance with warning flags as in :func:`solve_img_dist()` for floats '''
+
+    # is image distance at infinity?
+    if not p.df > p.fU:
+        return float('inf'), p.df-float('inf')-p.HH, Flag.OK
+
+    # total conjugate distance and discriminant of the quadratic
+    L = p.df - p.HH
+    disc = 1 - _div(4*p.fU, L)
+    bU = 2*p.fU/(1+math.sqrt(disc)) if disc >= 0 else L/2
+
+    # is object distance smaller than image distance?
+    flags = Flag.OBJ_DIST if disc < 0 or L - bU < 0 else Flag.OK
+
+    return bU, p.df-bU-p.HH, flags
+
+
+def _ray(j, i, bU, p):
+    ''' chief ray from micro lens j through pixel i as floats '''
+
+    # for pixel centres
+    s = j*p.pm
+    mc = -s/p.dA
+    uc = -mc*p.fs+s
+    u = uc+i*p.pp
+    mij = (s-u)/p.fs
+    Uij = mij*bU+s
+    Fij = mij*p.fU
+    qij = (Fij-Uij)/p.fU
+
+    return s, uc, u, mij, Uij, Fij, qij
+
+
+def _border_ray(s, u, bU, p):
+    ''' pixel border rays (DoF rays) from micro lens position s through pixel position u as floats '''
+
+    uU, uL = u+p.pp/2, u-p.pp/2
+    sU, sL = s+p.pm/2, s-p.pm/2
+    mijU, mijL = (s-uU)/p.fs, (s-uL)/p.fs
+    UijU, UijL = mijU*bU+sU, mijL*bU+sL
+    qijU, qijL = (mijU*p.fU-UijU)/p.fU, (mijL*p.fU-UijL)/p.fU
+
+    return uU, uL, sU, sL, mijU, mijL, UijU, UijL, qijU, qijL
+
+
+def _intersect(m0, m1, y0, y1):
+    ''' closed-form intersection of rays :math:`y = m z + y_0` matching :func:`solve_sle()` on 2x2 systems '''
+
+    det = m1 - m0
+    if det == 0:
+        raise np.linalg.LinAlgError('Singular matrix')
+
+    return (y0 - y1) / det, (m1*y0 - m0*y1) / det
+
+
+def _obj_dist(b, fU):
+    ''' thin lens object distance for image distance b '''
+
+    return _div(1., 1/fU - _div(1., b))
+
+
+def _div(x, y):
+    ''' float division following IEEE 754 semantics of numpy for zero divisors '''
+
+    if y:
+        return x / y
+    if x != x or x == 0:
+        return float('nan')
+
+    return math.copysign(float('inf'), x) * math.copysign(1., y)
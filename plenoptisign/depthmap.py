@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+__author__ = "Christopher Hahne"
+__email__ = "inbox@christopherhahne.de"
+__license__ = """
+Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import numpy as np
+
+from .mainclass import MainClass
+from .tria import triangulate, _viewpoint, _pp_new
+
+
+def disparity_to_depth(disp, G, out=None, tile=256, data=None, shape=None, dtype=None):
+    """
+
+    This function converts a disparity map of viewpoint gap :math:`G` to a metric depth map of triangulation distances
+    :math:`Z_{(G, \\Delta x)}` as obtained by :func:`tria()`. Camera constants :math:`b_U`, :math:`B_G`,
+    :math:`\\Phi_G` and the projected pixel pitch are computed once per call. The map is processed in tiles of rows so
+    that memory-mapped inputs and outputs larger than the available memory can be converted.
+
+    :param disp: disparity map or path to a .npy file or raw binary file
+    :param G: viewpoint gap
+    :param out: depth map or path to a .npy file or raw binary file which is created (allocated in memory if None)
+    :param tile: number of rows converted at once
+    :param data: dictionary of input parameters (see :class:`MainClass`)
+    :param shape: shape of a raw disparity file
+    :param dtype: data type of a raw disparity file
+    :type disp: :class:`~numpy:numpy.ndarray` or str
+    :type G: float
+    :type out: :class:`~numpy:numpy.ndarray` or str
+    :type tile: int
+    :type data: dict
+    :type shape: tuple
+    :type dtype: :class:`~numpy:numpy.dtype`
+
+    :return: **out**
+    :rtype: :class:`~numpy:numpy.ndarray` or :class:`~numpy:numpy.memmap`
+
+    """
+
+    disp = _open(disp, shape=shape, dtype=dtype)
+    out_dtype = np.promote_types(disp.dtype, np.float32)
+    out = np.empty(disp.shape, dtype=out_dtype) if out is None else _open(out, disp.shape, out_dtype, mode='w+')
+
+    # per camera constants
+    obj = MainClass(data)
+    obj.compute_img_dist()
+    qij, _, _, B, phi = _viewpoint(float(G), obj.bU, obj.pm, obj.pp, obj.fs, obj.dA, obj.fU)
+    pp_new = _pp_new(qij, B, obj.bU)
+
+    # tiled conversion
+    rows = disp.shape[0] if disp.ndim > 0 else 1
+    for start in range(0, rows, tile):
+        sl = slice(start, min(start+tile, rows))
+        out[sl] = triangulate(disp[sl], B, phi, pp_new, obj.bU, obj.fU)
+
+    if isinstance(out, np.memmap):
+        out.flush()
+
+    return out
+
+
+def _open(arr, shape=None, dtype=None, mode='r'):
+    ''' pass arrays through or memory-map .npy and raw binary files '''
+
+    if not isinstance(arr, str):
+        return arr
+
+    if arr.lower().endswith('.npy'):
+        if mode == 'r':
+            return np.load(arr, mmap_mode='r')
+        return np.lib.format.open_memmap(arr, mode=mode, dtype=dtype, shape=shape)
+
+    return np.memmap(arr, mode=mode, dtype=dtype if dtype is not None else np.float32, shape=shape)
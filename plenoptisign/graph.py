@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+__author__ = "Christopher Hahne"
+__email__ = "inbox@christopherhahne.de"
+__license__ = """
+Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from . import core
+
+
+class Node(namedtuple('Node', ['inputs', 'parents', 'func'])):
+    """ The Node describes a derived quantity by the input parameters it reads, the nodes it depends on and a function
+    called with the parameter record followed by the values of its parents. """
+
+    __slots__ = ()
+
+
+# derived quantities of scalar evaluations from main lens image distance to ray intersections
+NODES = {
+    'img_dist': Node(('df', 'fU', 'HH'), (), core.img_dist_scalar),
+    'M': Node(('D', 'fs', 'fU', 'pp'), (), lambda p: (p.D*p.fs)/(p.fU*p.pp)),
+    'refo_rays': Node(('a', 'M', 'pm', 'pp', 'fs', 'dA', 'fU'), ('img_dist',),
+                      lambda p, img: core.refo_rays(p, img[0])),
+    'refo': Node(('a', 'M', 'fU', 'HH'), ('img_dist', 'refo_rays'),
+                 lambda p, img, rays, validate=True: core.refo_intersect(p, img, rays, _decide(validate))),
+    'tria_view': Node(('G', 'pm', 'pp', 'fs', 'dA', 'fU'), ('img_dist',), lambda p, img: core.tria_view(p, img[0])),
+    'tria': Node(('dx', 'fU', 'HH'), ('img_dist', 'tria_view'),
+                 lambda p, img, view, validate=True: core.tria_triangulate(p, img, view, _decide(validate))),
+}
+
+
+class DepGraph(object):
+    """ The DepGraph holds the values of derived quantities and recomputes only what is downstream of changed
+    input parameters. Parameters are compared with the snapshot of the previous evaluation so that setting one
+    parameter invalidates its dependent nodes only, e.g. a new disparity :math:`\\Delta x` merely repeats the
+    triangulation step while rays, baseline and tilt angle are reused.
+    Owners notified of each parameter change, such as :class:`MainClass` via its attribute setter, call
+    :func:`invalidate()` themselves and skip the comparison by :func:`value()`.
+
+    :param nodes: dictionary mapping node names to :class:`Node` descriptions
+    :type nodes: dict
+
+    Usage example::
+
+        >> graph = DepGraph(NODES)
+        >> state = graph.get('tria', CameraParams.from_dict({'dx': 1}))
+        >> state = graph.get('tria', CameraParams.from_dict({'dx': 2}))
+        >> print(graph.evals)
+
+    """
+
+    def __init__(self, nodes=None):
+
+        self.nodes = nodes if nodes is not None else NODES
+        self.values = dict()
+        self.evals = dict((name, 0) for name in self.nodes)
+        self._inputs = dict()
+
+        # children of each node
+        children = dict((name, []) for name in self.nodes)
+        for name, node in self.nodes.items():
+            for parent in node.parents:
+                children[parent].append(name)
+
+        # all nodes downstream of each input parameter
+        self._downstream = dict()
+        for name, node in self.nodes.items():
+            for key in node.inputs:
+                stack = [name]
+                nodes = self._downstream.setdefault(key, set())
+                while stack:
+                    nodes.add(stack[-1])
+                    stack.extend(children[stack.pop()])
+
+    def invalidate(self, key):
+        ''' discard values of all nodes depending on given input parameter '''
+
+        for name in self._downstream.get(key, ()):
+            self.values.pop(name, None)
+
+        return True
+
+    def update(self, params):
+        ''' invalidate nodes downstream of parameters that changed since the previous call and return their keys '''
+
+        changed = []
+        for key in self._downstream:
+            val = getattr(params, key)
+            if key not in self._inputs or _changed(self._inputs[key], val):
+                self._inputs[key] = val
+                self.invalidate(key)
+                changed.append(key)
+
+        return changed
+
+    def get(self, name, params, **kwargs):
+        ''' return value of node for given parameters where keyword arguments are passed to its function only '''
+
+        self.update(params)
+
+        return self._eval(name, params, kwargs)
+
+    def value(self, name, params, **kwargs):
+        ''' return value of node for given parameters relying on :func:`invalidate()` of every changed parameter where
+        a callable validate keyword is only invoked if the node is recomputed '''
+
+        return self._eval(name, params, kwargs)
+
+    def clear(self):
+        ''' discard all values and the parameter snapshot '''
+
+        self.values.clear()
+        self._inputs.clear()
+
+        return True
+
+    def _eval(self, name, params, kwargs=None):
+        ''' evaluate parents first and store value unless still valid '''
+
+        if name in self.values:
+            return self.values[name]
+
+        node = self.nodes[name]
+        args = [self._eval(parent, params) for parent in node.parents]
+        val = node.func(params, *args, **(kwargs or {}))
+        self.values[name] = val
+        self.evals[name] += 1
+
+        return val
+
+
+def _decide(validate):
+    ''' validation decision where a callable is only asked once its node is actually evaluated '''
+
+    return validate() if callable(validate) else validate
+
+
+def _changed(old, new):
+    ''' compare parameter values being plain numbers or arrays '''
+
+    if old is new:
+        return False
+    try:
+        return bool(old != new)
+    except ValueError:
+        return not np.array_equal(old, new)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+__author__ = "Christopher Hahne"
+__email__ = "inbox@christopherhahne.de"
+__license__ = """
+Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import numpy as np
+
+from .constants import PlenoptisignError
+
+
+class DepthLUT(object):
+    """ The DepthLUT tabulates triangulation distances :math:`Z_{(G, \\Delta x)}` over disparities and refocusing
+    distances :math:`d_a, d_{a\\pm}` over shift parameters for a fixed camera. Queries are served by
+    :func:`~numpy:numpy.searchsorted` and linear interpolation.
+
+    Tables hold reciprocal distances as :math:`1/Z` is linear in :math:`\\Delta x`, which renders interpolation of
+    triangulation exact, and planes at infinity map to zero. The interpolation error of reciprocal distances (in 1/mm)
+    is estimated by the largest deviation from exact evaluation at the midpoints of all table intervals and stored in
+    :attr:`error_estimate`. This is a sampled estimate rather than a bound as errors may peak elsewhere within an
+    interval, yet for smooth tables and dense grids the relative error of a distance :math:`z` is about :math:`z` times
+    this value.
+
+    Usage example::
+
+        >> obj = plenoptisign.MainClass()
+        >> lut = plenoptisign.DepthLUT.build(obj, G=[-6, -3])
+        >> lut.save('camera_lut.npz')
+        >> Z = plenoptisign.DepthLUT.load('camera_lut.npz').depth(disparity_map, G=-6)
+
+    """
+
+    def __init__(self, G, dx, inv_Z, a, inv_refo, error_estimate=None):
+
+        self.G = np.asarray(G, dtype=float)             # ascending tabulated viewpoint gaps
+        self.dx = np.asarray(dx, dtype=float)           # ascending disparity grid
+        self.inv_Z = np.asarray(inv_Z, dtype=float)     # reciprocal triangulation distances per G
+        self.a = np.asarray(a, dtype=float)             # ascending shift parameter grid
+        self.inv_refo = np.asarray(inv_refo, dtype=float)   # reciprocal d, d_p and d_m
+        self.error_estimate = error_estimate if error_estimate is not None else dict()
+
+    @classmethod
+    def build(cls, obj, G=None, dx=None, a=None):
+        ''' This method tabulates the geometry of a :class:`MainClass` configuration.
+
+        :param obj: camera configuration
+        :param G: viewpoint gaps (defaults to obj.G)
+        :param dx: ascending disparity grid (defaults to 4097 samples in :math:`[-M, M]`)
+        :param a: ascending shift parameter grid (defaults to 4097 samples between infinity and the closest plane)
+        :type obj: :class:`MainClass`
+        :type G: :class:`~numpy:numpy.ndarray`
+        :type dx: :class:`~numpy:numpy.ndarray`
+        :type a: :class:`~numpy:numpy.ndarray`
+
+        :return: **lut**
+        :rtype: :class:`DepthLUT`
+
+        '''
+
+        G = np.unique(np.asarray(G if G is not None else obj.G, dtype=float))
+        dx = np.asarray(dx if dx is not None else np.linspace(-obj.M, obj.M, 4097), dtype=float)
+        if a is None:
+            # shift parameters from infinity to where the refocused image distance diverges (see refo_inv_vec())
+            a_min = obj.solve_a_for_distance(float('inf'))[0]
+            a_max = min(obj.M, obj.dA*obj.pp/(obj.pm*obj.fs))
+            a = np.linspace(a_min, a_max, 4097, endpoint=False)
+        a = np.asarray(a, dtype=float)
+
+        with np.errstate(divide='ignore'):
+            inv_Z = 1/obj.tria_batch(G[:, None], dx[None, :])[2]
+            inv_refo = 1/np.array(obj.refo_batch(a)[:3])
+
+        lut = cls(G, dx, inv_Z, a, inv_refo)
+
+        # estimate interpolation error at interval midpoints
+        dx_mid, a_mid = (dx[1:]+dx[:-1])/2, (a[1:]+a[:-1])/2
+        Z_exp = obj.tria_batch(G[:, None], dx_mid[None, :])[2]
+        lut.error_estimate['Z'] = _rec_err(lut.depth(dx_mid[None, :], G[:, None]), Z_exp)
+        refo_exp = obj.refo_batch(a_mid)
+        for key, res, res_exp in zip(('d', 'd_p', 'd_m'), lut.refo(a_mid), refo_exp):
+            lut.error_estimate[key] = _rec_err(res, res_exp)
+
+        return lut
+
+    def depth(self, dx, G):
+        ''' This method looks up triangulation distances for disparities of viewpoint gap(s) G present in the table.
+
+        :param dx: disparity values
+        :param G: tabulated viewpoint gap(s) broadcastable against dx
+        :type dx: :class:`~numpy:numpy.ndarray`
+        :type G: :class:`~numpy:numpy.ndarray`
+
+        :return: **Z** (NaN outside of the tabulated range)
+        :rtype: :class:`~numpy:numpy.ndarray`
+
+        '''
+
+        dx, G = np.broadcast_arrays(np.asarray(dx, dtype=float), np.asarray(G, dtype=float))
+        rows = np.clip(np.searchsorted(self.G, G), 0, len(self.G)-1)
+        if not np.all(self.G[rows] == G):
+            raise PlenoptisignError('Viewpoint gap not tabulated')
+
+        with np.errstate(divide='ignore'):
+            return 1/_interp(dx, self.dx, self.inv_Z, rows)
+
+    def refo(self, a):
+        ''' This method looks up refocusing distance and depth of field borders for shift parameters.
+
+        :param a: shift parameters
+        :type a: :class:`~numpy:numpy.ndarray`
+
+        :return: **d**, **d_p**, **d_m** (NaN outside of the tabulated range)
+        :rtype: tuple of :class:`~numpy:numpy.ndarray`
+
+        '''
+
+        a = np.asarray(a, dtype=float)
+
+        with np.errstate(divide='ignore'):
+            return tuple(1/_interp(a, self.a, self.inv_refo, np.full(a.shape, k)) for k in range(3))
+
+    def save(self, fp):
+        ''' write tables to compressed .npz file '''
+
+        np.savez_compressed(fp, G=self.G, dx=self.dx, inv_Z=self.inv_Z, a=self.a, inv_refo=self.inv_refo,
+                            **dict(('error_estimate_'+key, val) for key, val in self.error_estimate.items()))
+
+        return True
+
+    @classmethod
+    def load(cls, fp):
+        ''' read tables from .npz file '''
+
+        with np.load(fp) as npz:
+            prefix = 'error_estimate_'
+            error = dict((key[len(prefix):], npz[key]) for key in npz.files if key.startswith(prefix))
+            lut = cls(npz['G'], npz['dx'], npz['inv_Z'], npz['a'], npz['inv_refo'], error_estimate=error)
+
+        return lut
+
+
+def _interp(x, xp, fp, rows):
+    ''' linear interpolation of table rows fp[rows] sampled at ascending xp '''
+
+    idx = np.clip(np.searchsorted(xp, x, side='right')-1, 0, len(xp)-2)
+    w = (x-xp[idx])/(xp[idx+1]-xp[idx])
+    y = fp[rows, idx]*(1-w) + fp[rows, idx+1]*w
+
+    return np.where((x >= xp[0]) & (x <= xp[-1]), y, float('nan'))
+
+
+def _rec_err(res, res_exp):
+    ''' maximum absolute deviation of reciprocal distances '''
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        err = np.abs(1/res-1/res_exp)
+
+    return np.nanmax(err) if np.any(np.isfinite(err)) else 0.
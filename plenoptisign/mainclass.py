@@ -25,9 +25,21 @@ from . import tria
 from . import plt_refo
 from . import plt_tria
 from . import plt_3d
+from .solver import solve_img_dist
+from .cache import LRUCache
+from .graph import DepGraph, _changed
+from .validation import policy_step
+from .records import CameraParams, RefoResult, TriaResult
+from .constants import ABBS, Flag
 
 import numpy as np
 
+# public instance variables set from core state records
+STATE_VARS = ('d', 'd_p', 'd_m', 'dof', 'B', 'phi', 'Z', 'bU', 'aU')
+
+# instance variables holding input parameters incl. pupil diameter in place of F-number
+INPUT_VARS = frozenset(ABBS + ['D'])
+
 
 class MainClass(plt_3d.Mixin, plt_tria.Mixin, plt_refo.Mixin, tria.Mixin, refo.Mixin, object):
     """ The MainClass stores optical parameters and performs numerical light field geometry calculations.
@@ -46,10 +58,12 @@ class MainClass(plt_3d.Mixin, plt_tria.Mixin, plt_refo.Mixin, tria.Mixin, refo.M
 
     """
 
-    def __init__(self, data=None):
+    def __init__(self, data=None, cache_size=32, validate='always'):
         """ Initialize plenoptic camera parameters with following instance variables:
 
             :param data: dictionary containing input parameters (see full description below)
+            :param cache_size: maximum number of results stored by :func:`refo()` and :func:`tria()`
+            :param validate: validation policy 'always', 'sampled:N' or 'never' (see :func:`validation.policy_step()`)
             :param d: refocusing distance
             :param d_p: far depth of field border in refocusing
             :param d_m: near depth of field border in refocusing
@@ -58,9 +72,12 @@ class MainClass(plt_3d.Mixin, plt_tria.Mixin, plt_refo.Mixin, tria.Mixin, refo.M
             :param phi: tilt angle of virtual camera
             :param Z: triangulation distance
             :param bU: main lens image distance
-            :param console_msg: text for console output
+            :param flags: warning flags of recent computation
+            :param console_msg: text for console output rendered from flags
 
             :type data: dict
+            :type cache_size: int
+            :type validate: str
             :type d: float
             :type d_p: float
             :type d_m: float
@@ -69,6 +86,7 @@ class MainClass(plt_3d.Mixin, plt_tria.Mixin, plt_refo.Mixin, tria.Mixin, refo.M
             :type phi: float
             :type Z: float
             :type bU: float
+            :type flags: :class:`Flag`
             :type console_msg: str
 
             .. note::
@@ -113,8 +131,22 @@ class MainClass(plt_3d.Mixin, plt_tria.Mixin, plt_refo.Mixin, tria.Mixin, refo.M
         self._UijU = np.zeros(2)
         self._UijL = np.zeros(2)
 
-        # console message initialization
-        self.console_msg = ""
+        # warning flags initialization and shift parameter of the evaluation raising them
+        self.flags = Flag.OK
+        self._flags_a = self.a
+
+        # results and ray state of recent parameter sets restored as a whole, e.g. when toggling back in the GUI
+        self._cache = LRUCache(cache_size)
+
+        # stages of the latest parameter set reused where unaffected by an edit, which the cache keyed by complete
+        # parameter sets cannot provide, whereas the graph holds no earlier sets
+        self._graph = DepGraph()
+
+        # validation policy raising errors if unknown, aggregate deviations of recent batch and number of evaluations
+        policy_step(validate)
+        self.validate = validate
+        self.validation = None
+        self._n_eval = 0
 
     @property
     def data(self):
@@ -137,30 +169,80 @@ class MainClass(plt_3d.Mixin, plt_tria.Mixin, plt_refo.Mixin, tria.Mixin, refo.M
 
         '''
 
-        return self.data
+        return self.params.to_dict()
 
     @data.setter
     def data(self, data=None):
-        ''' put data dictionary to class variables while setting default values to avoid errors '''
+        ''' put data dictionary or :class:`CameraParams` to class variables while setting default values to avoid errors '''
 
         data = data if data is not None else dict()
 
-        self.pp = float(data['pp']) if 'pp' in data else .009           # pixel pitch
-        self.fs = float(data['fs']) if 'fs' in data else 2.75           # focal length of micro lens
-        self.hh = float(data['hh']) if 'hh' in data else .396           # principal plane separation of micro lens
-        self.pm = float(data['pm']) if 'pm' in data else .125           # micro lens pitch
-        self.dA = float(data['dA']) if 'dA' in data else 111.0324       # exit pupil distance
-        self.fU = float(data['fU']) if 'fU' in data else 193.2935       # focal length of objective lens
-        self.HH = float(data['HH']) if 'HH' in data else -65.5563       # principal plane spacing in objective lens
-        self.df = float(data['df']) if 'df' in data else float('inf')   # object distance
-        self.D = self.fU/float(data['f_num']) if 'f_num' in data else self.fU/16.   # main lens pupil diameter
-        self.a = float(data['a']) if 'a' in data else 1.0               # iterative refocusing parameter
-        self.M = float(data['M']) if 'M' in data else 13.9523           # 1-D micro image diameter
-        self.G = float(data['G']) if 'G' in data else -6                # viewpoint gap
-        self.dx = float(data['dx']) if 'dx' in data else 1              # disparity value
-        self.sd = tuple(data['sd']) if 'sd' in data else (24.048,36.072)# sensor dimensions
-        self.refo_opt = float(data['refo']) if 'refo' in data else True # refo bool option
-        self.tria_opt = float(data['tria']) if 'tria' in data else True # tria bool option
+        self.params = CameraParams.coerce(data)
+
+        # records hold no GUI options
+        if isinstance(data, CameraParams):
+            self.refo_opt = self.tria_opt = True
+        else:
+            self.refo_opt = float(data['refo']) if 'refo' in data else True # refo bool option
+            self.tria_opt = float(data['tria']) if 'tria' in data else True # tria bool option
+
+    def __setattr__(self, name, val):
+        ''' update parameter snapshot and discard derived quantities of the dependency graph when an input parameter
+        changes so that evaluations neither rebuild nor compare all parameters '''
+
+        attrs = self.__dict__
+        if name in INPUT_VARS and (name not in attrs or _changed(attrs[name], val)):
+            params = attrs.get('_params')
+            # F-number follows from both focal length and pupil diameter on next snapshot
+            if name in ('fU', 'D'):
+                params = None
+            # numpy scalars as plain numbers for the scalar engine to compute in double precision
+            elif params is not None and name != 'f_num':
+                params = params._replace(**{name: val.item() if isinstance(val, np.generic) else val})
+            attrs['_params'] = params
+            if '_graph' in attrs:
+                self._graph.invalidate(name)
+        object.__setattr__(self, name, val)
+
+    @property
+    def params(self):
+        ''' Immutable snapshot of the input parameters as :class:`CameraParams` record, rebuilt after changes only '''
+
+        params = self.__dict__.get('_params')
+        if params is None:
+            vals = dict((key, self.fU/self.D if key == 'f_num' else getattr(self, key)) for key in ABBS)
+            # numpy scalars as plain numbers for the scalar engine to compute in double precision
+            params = CameraParams(**dict((key, val.item() if isinstance(val, np.generic) else val)
+                                         for key, val in vals.items()))
+            self.__dict__['_params'] = params
+
+        return params
+
+    @params.setter
+    def params(self, params):
+
+        for key in ABBS:
+            if key != 'f_num':
+                setattr(self, key, getattr(params, key))
+        self.D = params.D   # main lens pupil diameter
+
+    @property
+    def refo_result(self):
+        ''' Results of :func:`refo()` as :class:`RefoResult` record '''
+
+        return RefoResult(self.d, self.d_p, self.d_m, self.dof)
+
+    @property
+    def tria_result(self):
+        ''' Results of :func:`tria()` as :class:`TriaResult` record '''
+
+        return TriaResult(self.B, self.phi, self.Z)
+
+    @property
+    def console_msg(self):
+        ''' Text for console output rendered from the warning flags of the most recent warning '''
+
+        return Flag(self.flags).render(self._flags_a)
 
     def get_results(self):
         ''' This is the getter function for output parameters. See :func:`__init__()` for more details on the parameters.
@@ -169,50 +251,97 @@ class MainClass(plt_3d.Mixin, plt_tria.Mixin, plt_refo.Mixin, tria.Mixin, refo.M
             :rtype: list
         '''
 
-        return list([self.d, self.d_p, self.d_m, self.dof, self.B, self.phi, self.Z])
+        return list(self.refo_result + self.tria_result)
 
     def compute_img_dist(self):
-        ''' This method iteratively computes the main lens image distance :math:`b_U` via
-        :math:`b_U = (\\frac{1}{f_U}-\\frac{1}{a_U})^{-1}` until both sides match. The initial value is :math:`b_U=f_U`.
+        ''' This method computes the main lens image distance :math:`b_U` from the closed-form solution of
+        :math:`b_U = (\\frac{1}{f_U}-\\frac{1}{a_U})^{-1}` with :math:`a_U = d_f-b_U-H_{1U}H_{2U}`
+        (see :func:`solve_img_dist()`).
 
         :return: **True**
         :rtype: bool
 
         '''
 
-        # is image distance at focal plane?
-        if self.df == float('inf'):
-            self.bU = self.fU
-        # is image distance between infinity and focal plane?
-        elif self.df > self.fU:
-            # set initial values for iteration
-            self.bU = self.fU
-            self.aU = self.df - self.fU - self.HH
-            # calculate paraxial image and object distance iteratively
-            while self.bU != (1/self.fU-1/self.aU)**-1:
-                self.bU = (1/self.fU-1/self.aU)**-1
-                self.aU = self.df-self.bU-self.HH
-                # is object distance smaller than image distance?
-                if self.aU < 0:
-                    self.bU = (1/self.fU-1/self.aU)**-1
-                    self.console_msg = 'Object distance smaller than image distance'
-                    break
-        # is image distance at infinity?
-        elif self.df <= self.fU:
-            self.bU = float('inf')
+        bU, mask = solve_img_dist(self.df, self.fU, self.HH)
+        self.bU = float(bU)
+        self.aU = self.df-self.bU-self.HH
+
+        # is object distance smaller than image distance?
+        if mask:
+            self.flags, self._flags_a = Flag.OBJ_DIST, self.a
+
+        return True
+
+    def cache_info(self):
+        ''' This method reports usage of the result cache of :func:`refo()` and :func:`tria()`.
+
+        :return: **hits**, **misses**, **maxsize**, **currsize**
+        :rtype: tuple
+
+        '''
+
+        return self._cache.hits, self._cache.misses, self._cache.maxsize, len(self._cache)
+
+    def cache_clear(self):
+        ''' This method invalidates all stored results of :func:`refo()` and :func:`tria()`.
+
+        :return: **True**
+        :rtype: bool
+
+        '''
+
+        self._graph.clear()
+
+        return self._cache.clear()
+
+    def _cache_key(self, method, names):
+        ''' hashable snapshot of input parameters relevant to given method '''
+
+        return (method,) + tuple(getattr(self, name) for name in names)
+
+    def _validate_next(self):
+        ''' count evaluation and decide whether it is validated according to policy '''
+
+        step = policy_step(self.validate)
+        self._n_eval += 1
+
+        return step > 0 and (self._n_eval-1) % step == 0
+
+    def _set_state(self, state):
+        ''' transfer results and ray intermediates of a :mod:`core` state record to instance variables '''
+
+        # state variables are no input parameters and thus bypass __setattr__()
+        attrs = self.__dict__
+        for field, val in zip(state._fields, state):
+            # flags are only overwritten by warnings
+            if field == 'flags' and val:
+                attrs['flags'], attrs['_flags_a'] = val, self.a
+            elif field == 'flags':
+                continue
+            # rays are not traced by closed-form methods
+            elif val is None:
+                continue
+            # triangulation only shifts first micro image ray position
+            elif field == 'u0':
+                attrs['_u'] = (val, self._u[1])
+            else:
+                name = field if field in STATE_VARS else '_'+field
+                # tuples of the scalar engine are immutable and thus shared
+                attrs[name] = val
 
         return True
 
     def compute_mic_img_size(self):
         ''' This method mutates the micro image size :math:`M` according to
-            :math:`M = \\frac{D \\times f_s}{f_U \\times p_p}`.
+            :math:`M = \\frac{D \\times f_s}{f_U \\times p_p}`, which is kept until one of these parameters changes.
 
             :return: **True**
             :rtype: bool
 
         '''
 
-        self.M = (self.D*self.fs)/(self.fU*self.pp)
+        self.M = self._graph.value('M', self.params)
 
         return True
 
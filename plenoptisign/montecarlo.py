@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+
+__author__ = "Christopher Hahne"
+__email__ = "inbox@christopherhahne.de"
+__license__ = """
+Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .sweep import KEYS, _params, _fields, _eval
+from .constants import Flag, PlenoptisignError
+
+# distributions given by name of a numpy.random.Generator method
+DISTS = ('normal', 'uniform', 'triangular', 'lognormal')
+
+
+class Summary(object):
+    """ The Summary is a streaming histogram of one result field with fixed bin edges where values below and above
+    the edges are counted in an extra bin on each side. Non-finite values are only counted while finite values
+    additionally update minimum, maximum, mean and variance. Summaries of chunks are merged so that memory does not
+    grow with the number of samples.
+
+    :param edges: monotonically increasing bin edges
+    :type edges: :class:`~numpy:numpy.ndarray`
+
+    """
+
+    def __init__(self, edges):
+
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(self.edges.size+1, dtype=np.int64)
+        self.nonfinite = 0
+        self.n = 0
+        self.min = float('inf')
+        self.max = -float('inf')
+        self.mean = 0.
+        self._m2 = 0.
+
+    @property
+    def std(self):
+        return float(np.sqrt(self._m2/self.n)) if self.n > 0 else float('nan')
+
+    def update(self, values):
+        ''' add values to histogram and moments '''
+
+        values = np.asarray(values, dtype=float).ravel()
+        finite = values[np.isfinite(values)]
+        self.nonfinite += values.size - finite.size
+        if finite.size == 0:
+            return self
+
+        # bin index where 0 and last denote values outside of edges
+        idx = np.searchsorted(self.edges, finite, side='right')
+        idx[finite == self.edges[-1]] = self.edges.size-1
+        self.counts += np.bincount(idx, minlength=self.counts.size)
+
+        other = Summary(self.edges)
+        other.n, other.min, other.max = finite.size, finite.min(), finite.max()
+        other.mean = finite.mean()
+        other._m2 = np.sum((finite-other.mean)**2)
+
+        return self._merge_moments(other)
+
+    def merge(self, other):
+        ''' add counts and moments of other summary with same edges '''
+
+        if not np.array_equal(self.edges, other.edges):
+            raise PlenoptisignError('Summaries with different bin edges cannot be merged')
+
+        self.counts += other.counts
+        self.nonfinite += other.nonfinite
+
+        return self._merge_moments(other)
+
+    def percentile(self, q):
+        ''' percentiles of finite values in percent interpolated linearly within bins '''
+
+        q = np.asarray(q, dtype=float)
+        if self.n == 0:
+            return np.full(q.shape, float('nan'))
+
+        # outer bins span from edges to minimum and maximum
+        nodes = np.concatenate([[min(self.min, self.edges[0])], self.edges, [max(self.max, self.edges[-1])]])
+        cum = np.cumsum(self.counts)
+        t = q/100 * self.n
+        k = np.minimum(np.searchsorted(cum, t, side='left'), self.counts.size-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = np.where(self.counts[k] > 0, (t - cum[k] + self.counts[k]) / self.counts[k], 0)
+
+        return np.clip(nodes[k] + frac*(nodes[k+1]-nodes[k]), self.min, self.max)
+
+    def _merge_moments(self, other):
+        ''' combine mean and sum of squared deviations of two sample sets '''
+
+        n = self.n + other.n
+        if other.n > 0:
+            delta = other.mean - self.mean
+            self._m2 += other._m2 + delta**2 * self.n*other.n/n
+            self.mean += delta * other.n/n
+            self.n = n
+            self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+
+        return self
+
+
+class MonteCarloResult(object):
+    """ The MonteCarloResult holds the outcome of :func:`run()`.
+
+    :param n: number of samples
+    :param summaries: dictionary mapping each requested result field of :data:`RABB` to its :class:`Summary`
+    :param flags: dictionary mapping each warning :class:`Flag` to the number of samples raising it
+    :type n: int
+    :type summaries: dict
+    :type flags: dict
+
+    Usage example::
+
+        >> res = plenoptisign.montecarlo.run({'fs': ('normal', 2.75, .01)}, n=10**6, seed=0)
+        >> res['d'].percentile([5, 50, 95])
+
+    """
+
+    def __init__(self, n, summaries, flags):
+
+        self.n = n
+        self.summaries = summaries
+        self.flags = flags
+
+    def __getitem__(self, key):
+        return self.summaries[key]
+
+    def percentile(self, q):
+        ''' percentiles of all result fields as dictionary '''
+
+        return dict((key, summary.percentile(q)) for key, summary in self.summaries.items())
+
+
+def run(dists, data=None, n=10**5, seed=None, chunk_size=2**16, workers=None, outputs=None, bins=256, ranges=None):
+    """
+
+    This function draws n samples of input parameters from given distributions, evaluates :func:`refo()` and
+    :func:`tria()` on the batch engine of :func:`~plenoptisign.sweep.run()` in chunks and accumulates a streaming
+    :class:`Summary` of each result field per chunk so that memory use is bounded by the chunk size rather than by n.
+
+    :param dists: dictionary mapping keys of :data:`ABBS` to a tuple of a name in :data:`DISTS` followed by arguments
+        of the corresponding :class:`~numpy:numpy.random.Generator` method, e.g. {'fs': ('normal', 2.75, .01)}
+    :param data: dictionary of fixed input parameters (see :class:`MainClass`) for keys not present in dists
+    :param n: number of samples
+    :param seed: seed of random number generator for reproducible runs
+    :param chunk_size: number of samples evaluated at once
+    :param workers: number of processes evaluating chunks in parallel (sequential if None)
+    :param outputs: result fields of :data:`RABB` to be summarized (all if None)
+    :param bins: number of histogram bins
+    :param ranges: dictionary mapping result fields to (min, max) of histogram bins (from first chunk if not present)
+    :type dists: dict
+    :type data: dict
+    :type n: int
+    :type seed: int
+    :type chunk_size: int
+    :type workers: int
+    :type outputs: iterable of str
+    :type bins: int
+    :type ranges: dict
+
+    :return: **result**
+    :rtype: :class:`MonteCarloResult`
+
+    .. note::
+        Each chunk draws from its own generator spawned from the seed and summaries are merged in chunk order. Results
+        are thus identical for any number of workers whereas a different chunk size yields different samples.
+
+    .. note::
+        As in :func:`~plenoptisign.sweep.run()`, the micro image resolution :math:`M` follows from a sampled
+        F-number unless :math:`M` is sampled as well. The micro lens principal plane separation :math:`hh` may be
+        sampled, but only affects plots.
+
+    """
+
+    for key in dists:
+        if key not in KEYS:
+            raise PlenoptisignError('Parameter %s cannot be sampled' % key)
+        if not dists[key] or dists[key][0] not in DISTS:
+            raise PlenoptisignError('Invalid distribution %s of parameter %s' % (dists[key], key))
+    if n < 1 or chunk_size < 1 or bins < 1:
+        raise PlenoptisignError('Number of samples, chunk size and bins have to be positive')
+
+    keys = _fields(outputs)
+    params = _params(data)
+    dists = dict((key, tuple(dists[key])) for key in dists)
+
+    sizes = [min(chunk_size, n-start) for start in range(0, n, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    # bin edges from first chunk where ranges are not given
+    vals, flags = _sample_eval(params, dists, keys, seeds[0], sizes[0])
+    ranges = dict(ranges or {})
+    edges = dict((key, _edges(ranges[key] if key in ranges else _range(vals[key]), bins)) for key in keys)
+    summaries, counts = _summarize(vals, flags, edges)
+
+    args = [(params, dists, keys, s, size, edges) for s, size in zip(seeds[1:], sizes[1:])]
+    if workers is None or workers < 2:
+        results = (_eval_summary(*arg) for arg in args)
+        _merge(summaries, counts, results)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            _merge(summaries, counts, executor.map(_eval_summary, *zip(*args)) if args else ())
+
+    return MonteCarloResult(n, summaries, counts)
+
+
+def _sample_eval(params, dists, keys, seed, size):
+    ''' draw parameter samples of one chunk and evaluate requested result fields '''
+
+    rng = np.random.default_rng(seed)
+    p = dict(params)
+    for key, (name, *args) in dists.items():
+        p[key] = getattr(rng, name)(*args, size=size)
+
+    # broadcast result fields of samples not varying in all parameters
+    res, flags = _eval(p, dists, keys)
+    res = dict((key, np.broadcast_to(res[key], (size,))) for key in keys)
+
+    return res, np.broadcast_to(flags, (size,))
+
+
+def _summarize(vals, flags, edges):
+    ''' summaries of result fields and warning flag counts of one chunk '''
+
+    summaries = dict((key, Summary(edges[key]).update(vals[key])) for key in edges)
+    counts = dict((flag, int(np.count_nonzero(flags & flag))) for flag in Flag if flag)
+
+    return summaries, counts
+
+
+def _eval_summary(params, dists, keys, seed, size, edges):
+    ''' worker entry point returning summaries of one chunk only '''
+
+    vals, flags = _sample_eval(params, dists, keys, seed, size)
+
+    return _summarize(vals, flags, edges)
+
+
+def _merge(summaries, counts, results):
+    ''' merge chunk results in order into summaries and flag counts '''
+
+    for chunk_summaries, chunk_counts in results:
+        for key in summaries:
+            summaries[key].merge(chunk_summaries[key])
+        for flag in counts:
+            counts[flag] += chunk_counts[flag]
+
+    return True
+
+
+def _range(values):
+    ''' range of finite values widened where degenerate '''
+
+    finite = values[np.isfinite(values)]
+    if finite.size == 0:
+        return 0., 1.
+
+    lo, hi = float(finite.min()), float(finite.max())
+    if lo == hi:
+        pad = max(abs(lo), 1) * 1e-6
+        lo, hi = lo-pad, hi+pad
+
+    return lo, hi
+
+
+def _edges(rng, bins):
+    ''' equidistant bin edges for given range '''
+
+    lo, hi = rng
+    if not lo < hi:
+        raise PlenoptisignError('Invalid histogram range %s' % (rng,))
+
+    return np.linspace(lo, hi, bins+1)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+__author__ = "Christopher Hahne"
+__email__ = "inbox@christopherhahne.de"
+__license__ = """
+Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .constants import ABBS, RABB, PlenoptisignError
+
+
+class CameraParams(namedtuple('CameraParams', ABBS)):
+    """ The CameraParams is an immutable and hashable record of the input parameters in :data:`ABBS` order
+    (see :class:`MainClass` for their description). Instances use :attr:`__slots__` and thus no per-instance dict.
+
+    Usage example::
+
+        >> params = plenoptisign.CameraParams.from_dict({'fU': 100, 'df': 1500})
+        >> params = params._replace(a=2.)
+        >> batch = plenoptisign.records.to_array([params]*1000)
+
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data=None):
+        ''' parse data dictionary while setting default values to avoid errors '''
+
+        data = data if data is not None else dict()
+
+        return cls(
+            sd=tuple(float(v) for v in data['sd']) if 'sd' in data else (24.048, 36.072),  # sensor dimensions
+            pp=float(data['pp']) if 'pp' in data else .009,                 # pixel pitch
+            fs=float(data['fs']) if 'fs' in data else 2.75,                 # focal length of micro lens
+            hh=float(data['hh']) if 'hh' in data else .396,                 # principal plane separation of micro lens
+            pm=float(data['pm']) if 'pm' in data else .125,                 # micro lens pitch
+            dA=float(data['dA']) if 'dA' in data else 111.0324,             # exit pupil distance
+            fU=float(data['fU']) if 'fU' in data else 193.2935,             # focal length of objective lens
+            HH=float(data['HH']) if 'HH' in data else -65.5563,             # principal plane spacing in objective lens
+            df=float(data['df']) if 'df' in data else float('inf'),         # object distance
+            f_num=float(data['f_num']) if 'f_num' in data else 16.,         # F-number
+            a=float(data['a']) if 'a' in data else 1.0,                     # iterative refocusing parameter
+            M=float(data['M']) if 'M' in data else 13.9523,                 # 1-D micro image diameter
+            G=float(data['G']) if 'G' in data else -6.,                     # viewpoint gap
+            dx=float(data['dx']) if 'dx' in data else 1.,                   # disparity value
+        )
+
+    @classmethod
+    def coerce(cls, data=None):
+        ''' return data if already a record or parse data dictionary otherwise (see :func:`from_dict()`) '''
+
+        return data if isinstance(data, cls) else cls.from_dict(data)
+
+    @property
+    def D(self):
+        ''' main lens pupil diameter '''
+        return self.fU/self.f_num
+
+    def to_dict(self):
+        return dict(self._asdict())
+
+
+class RefoResult(namedtuple('RefoResult', RABB[:4])):
+    """ The RefoResult is an immutable record of refocusing distance, far and near depth of field border and depth of
+    field as computed by :func:`refo()`. Batch functions fill its fields with arrays. """
+
+    __slots__ = ()
+
+
+class TriaResult(namedtuple('TriaResult', RABB[4:])):
+    """ The TriaResult is an immutable record of baseline, tilt angle and triangulation distance as computed by
+    :func:`tria()`. Batch functions fill its fields with arrays. """
+
+    __slots__ = ()
+
+
+class RayBundle(namedtuple('RayBundle', ['s', 'u', 'mij', 'Uij', 'qij'])):
+    """ The RayBundle is an immutable record of micro lens positions, pixel positions, image side ray slopes, main lens
+    intersections and object side ray slopes of many rays as generated in :mod:`bundle`. """
+
+    __slots__ = ()
+
+
+class Viewpoints(namedtuple('Viewpoints', ['G', 'B', 'phi', 'ent_pup_pos'])):
+    """ The Viewpoints is an immutable record of viewpoint gaps with baselines, tilt angles and entrance pupil
+    positions of the corresponding virtual cameras as computed by :func:`viewpoints()`. """
+
+    __slots__ = ()
+
+
+class ViewpointPairs(namedtuple('ViewpointPairs', ['G1', 'G2', 'B', 'phi'])):
+    """ The ViewpointPairs is an immutable record of viewpoint gap pairs with the baseline and relative tilt angle
+    between both virtual cameras as computed by :func:`viewpoint_pairs()`. """
+
+    __slots__ = ()
+
+
+class DepthResolution(namedtuple('DepthResolution', ['dx', 'Z', 'dZ', 'rel', 'max_range', 'planes'])):
+    """ The DepthResolution is an immutable record of disparities, triangulation distances, depth steps per disparity
+    step and their relative errors per viewpoint gap along with the maximum usable range and the number of
+    distinguishable depth planes as computed by :func:`depth_resolution()`. """
+
+    __slots__ = ()
+
+
+class ValidationStats(namedtuple('ValidationStats', ['count', 'max_dev', 'mean_dev'])):
+    """ The ValidationStats is an immutable record of the number of compared values as well as maximum and mean
+    absolute deviation between alternative computations of a batch (see :mod:`validation`). """
+
+    __slots__ = ()
+
+
+# structured data types carrying records in batches
+PARAMS_DTYPE = np.dtype([(key, float, (2,)) if key == 'sd' else (key, float) for key in ABBS])
+REFO_DTYPE = np.dtype([(key, float) for key in RefoResult._fields])
+TRIA_DTYPE = np.dtype([(key, float) for key in TriaResult._fields])
+DTYPES = {CameraParams: PARAMS_DTYPE, RefoResult: REFO_DTYPE, TriaResult: TRIA_DTYPE}
+
+
+def to_array(records):
+    """
+
+    This function packs a sequence of records of one type into a structured array of the corresponding dtype.
+
+    :param records: sequence of :class:`CameraParams`, :class:`RefoResult` or :class:`TriaResult`
+    :type records: list
+
+    :return: **arr**
+    :rtype: :class:`~numpy:numpy.ndarray`
+
+    """
+
+    records = list(records)
+    dtype = DTYPES[type(records[0])] if records else PARAMS_DTYPE
+
+    return np.array([tuple(record) for record in records], dtype=dtype)
+
+
+def from_array(arr):
+    """
+
+    This function unpacks a structured array into a list of records.
+
+    :param arr: structured array of :data:`PARAMS_DTYPE`, :data:`REFO_DTYPE` or :data:`TRIA_DTYPE`
+    :type arr: :class:`~numpy:numpy.ndarray`
+
+    :return: **records**
+    :rtype: list
+
+    """
+
+    cls = dict((dtype, cls) for cls, dtype in DTYPES.items())[arr.dtype]
+
+    return [cls(*(tuple(val) if np.ndim(val) else val for val in row.tolist())) for row in arr.reshape(-1)]
+
+
+def select(outputs, cls):
+    """
+
+    This function validates requested result fields of a record type where None requests all fields.
+
+    :param outputs: field names, e.g. ('d',) or ('Z', 'B'), or None
+    :param cls: :class:`RefoResult` or :class:`TriaResult`
+    :type outputs: tuple
+    :type cls: type
+
+    :return: **fields**
+    :rtype: frozenset
+
+    """
+
+    if outputs is None:
+        return frozenset(cls._fields)
+
+    fields = frozenset((outputs,) if isinstance(outputs, str) else outputs)
+    if not fields or not fields.issubset(cls._fields):
+        raise PlenoptisignError('Invalid outputs %s for %s' % (outputs, cls.__name__))
+
+    return fields
+
+
+def pick(cls, fields, vals):
+    """ record of values where fields that are not requested are None """
+
+    return cls(*(val if key in fields else None for key, val in zip(cls._fields, vals)))
@@ -21,21 +21,344 @@ Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
 """
 
 import numpy as np
-from .solver import solve_sle
-from plenoptisign.constants import PlenoptisignError, DEC_P
+from .solver import solve_sle_2x2, sle_rays, solve_img_dist
+from . import core
+from .records import RefoResult, select, pick
+from .validation import policy_step, sample, deviation_stats
+from plenoptisign.constants import PlenoptisignError, Flag, DEC_P
+
+# input parameters of refo() used for caching
+REFO_INPUTS = ('pp', 'fs', 'pm', 'dA', 'fU', 'HH', 'df', 'a', 'M')
+
+# refocusing methods of ray tracing and closed-form expressions
+REFO_METHODS = ('raytrace', 'analytic')
+
+
+def refo_vec(a, bU, M, pm, pp, fs, dA, fU, HH, outputs=None, offset=0):
+    ''' This function is the vectorized counterpart of :func:`refo()`. All arguments are broadcast against each other
+    so that the refocusing distance and depth of field borders are obtained for whole arrays in a single pass.
+    Branches for planes at and beyond infinity are replaced by element-wise masks. Only ray pairs needed for the
+    requested outputs are stacked and solved. Results are not validated here (see :func:`validate_vec()`). An offset
+    shifts the intersecting micro lenses away from the optical axis.
+
+    :param a: refocusing shift parameter
+    :param bU: main lens image distance
+    :param M: 1-D micro image diameter
+    :param pm: micro lens pitch
+    :param pp: pixel pitch
+    :param fs: focal length of micro lens
+    :param dA: exit pupil distance
+    :param fU: focal length of objective lens
+    :param HH: principal plane spacing in objective lens
+    :param outputs: names of requested result fields where None requests all
+    :param offset: micro lens index around which the intersecting rays are aligned
+    :type a: :class:`~numpy:numpy.ndarray`
+    :type outputs: iterable of str
+    :type offset: :class:`~numpy:numpy.ndarray`
+
+    :return: **d**, **d_p**, **d_m**, **dof** where fields not requested are None
+    :rtype: :class:`RefoResult` of :class:`~numpy:numpy.ndarray`
+
+    '''
+
+    out = select(outputs, RefoResult)
+    need = out | {'d_p', 'd_m'} if 'dof' in out else out
+    a = np.asarray(a, dtype=float)
+
+    # align intersection to be as paraxial as possible
+    c = (M-1)/2
+    j = [offset-np.round(a*(M-1)/2, DEC_P)]
+    j.append(a*(M-1)+j[0])
+
+    # rays for pixel centres of both micro lenses
+    s, u, mij, Uij, qij = zip(*[_rays(j[k], c if k == 0 else -c, pm, pp, fs, dA, bU, fU) for k in range(2)])
+
+    # ray pairs behind image sensor and in object space where the chief image distance is always required for masks
+    systems = {'b_new': (mij[0], mij[1], s[0], s[1])}
+    if 'd' in need:
+        systems['d'] = (qij[0], qij[1], Uij[0], Uij[1])
+    if need & {'d_p', 'd_m'}:
+        sU, sL, mijU, mijL, UijU, UijL, qijU, qijL = zip(*[_border_rays(s[k], mij[k], pm, pp, fs, bU, fU)
+                                                           for k in range(2)])
+        if 'd_p' in need:
+            systems['b_new_p'] = (mijU[0], mijL[1], sU[0], sL[1])
+            systems['d_p'] = (qijU[0], qijL[1], UijU[0], UijL[1])
+        if 'd_m' in need:
+            systems['b_new_m'] = (mijL[0], mijU[1], sL[0], sU[1])
+            systems['d_m'] = (qijL[0], qijU[1], UijL[0], UijU[1])
+
+    # stack ray pairs to solve them at once
+    A, b = sle_rays(*[np.stack(np.broadcast_arrays(*coeffs)) for coeffs in zip(*systems.values())])
+    z = dict(zip(systems, solve_sle_2x2(A, b)[0][..., 0]))
+
+    d = d_p = d_m = dof = None
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        # masks for refocused planes and DoF borders located before infinity
+        d_mask = (bU >= fU) & (bU-z['b_new'] > fU)
+
+        # ray intersections in object space
+        if 'd' in need:
+            d = np.where(d_mask, z['d']+bU+HH, float('inf'))
+        if 'd_p' in need:
+            d_p_mask = bU-z['b_new_p'] > fU
+            d_p = np.where(d_p_mask, z['d_p']+bU+HH, float('inf'))
+        if 'd_m' in need:
+            d_m_mask = d_mask | (bU-z['b_new_m'] > fU)
+            d_m = np.where(d_m_mask, z['d_m']+bU+HH, float('inf'))
+        if 'dof' in need:
+            dof = np.where(d_p_mask & d_m_mask, d_p-d_m, float('inf'))
+
+    return pick(RefoResult, out, (d, d_p, d_m, dof))
+
+
+def refo_ana_vec(a, bU, M, pm, pp, fs, dA, fU, HH, outputs=None):
+    ''' This function is the closed-form counterpart of :func:`refo_vec()`. Intersecting the chief rays
+    (:math:`\\sigma=0`) and the pixel border rays of the near (:math:`\\sigma=1`) and far (:math:`\\sigma=-1`) depth
+    of field border behind the sensor in the paraxial model yields the image distances
+
+    :math:`b_{U,\\sigma} = b_U + \\frac{K (a (M-1) + \\sigma)}{M-1-\\sigma - a (M-1) K/d_{A\'}}` with
+    :math:`K = \\frac{p_m f_s}{p_p}`,
+
+    which are mapped to object space by the thin lens equation. Hence, no rays are traced and no linear systems are
+    solved. Masks for planes at and beyond infinity are the same as in :func:`refo_vec()`.
+
+    :param a: refocusing shift parameter
+    :param bU: main lens image distance
+    :param M: 1-D micro image diameter
+    :param pm: micro lens pitch
+    :param pp: pixel pitch
+    :param fs: focal length of micro lens
+    :param dA: exit pupil distance
+    :param fU: focal length of objective lens
+    :param HH: principal plane spacing in objective lens
+    :param outputs: names of requested result fields where None requests all
+    :type a: :class:`~numpy:numpy.ndarray`
+    :type outputs: iterable of str
+
+    :return: **d**, **d_p**, **d_m**, **dof** where fields not requested are None
+    :rtype: :class:`RefoResult` of :class:`~numpy:numpy.ndarray`
+
+    '''
+
+    out = select(outputs, RefoResult)
+    need = out | {'d_p', 'd_m'} if 'dof' in out else out
+    a = np.asarray(a, dtype=float)
+
+    # micro image shift spanned by both chief rays
+    K = pm*fs/pp
+    T = a*(M-1)
+
+    d = d_p = d_m = dof = None
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        # ray intersections behind image sensor
+        b_new = bU + K*T/(M-1 - T*K/dA)
+
+        # masks for refocused planes and DoF borders located before infinity
+        d_mask = (bU >= fU) & (b_new > fU)
+
+        # thin lens equation for object distances
+        if 'd' in need:
+            d = np.where(d_mask, (1/fU-1/b_new)**-1+bU+HH, float('inf'))
+        if 'd_p' in need:
+            b_new_p = bU + K*(T-1)/(M - T*K/dA)
+            d_p_mask = b_new_p > fU
+            d_p = np.where(d_p_mask, (1/fU-1/b_new_p)**-1+bU+HH, float('inf'))
+        if 'd_m' in need:
+            b_new_m = bU + K*(T+1)/(M-2 - T*K/dA)
+            d_m_mask = d_mask | (b_new_m > fU)
+            d_m = np.where(d_m_mask, (1/fU-1/b_new_m)**-1+bU+HH, float('inf'))
+        if 'dof' in need:
+            dof = np.where(d_p_mask & d_m_mask, d_p-d_m, float('inf'))
+
+    return pick(RefoResult, out, (d, d_p, d_m, dof))
+
+
+def refo_flags_vec(a, bU, M, pm, pp, fs, dA, fU, obj_mask=False):
+    ''' This function computes the warning flags of :func:`refo()` per element as uint16 array (see :class:`Flag`).
+    Planes at and beyond infinity are told apart by the closed-form image distance of :func:`refo_ana_vec()`.
+
+    :param a: refocusing shift parameter
+    :param bU: main lens image distance
+    :param M: 1-D micro image diameter
+    :param pm: micro lens pitch
+    :param pp: pixel pitch
+    :param fs: focal length of micro lens
+    :param dA: exit pupil distance
+    :param fU: focal length of objective lens
+    :param obj_mask: True where object distance is smaller than image distance (see :func:`solve_img_dist()`)
+    :type a: :class:`~numpy:numpy.ndarray`
+    :type obj_mask: :class:`~numpy:numpy.ndarray`
+
+    :return: **flags**
+    :rtype: :class:`~numpy:numpy.ndarray`
+
+    '''
+
+    a = np.asarray(a, dtype=float)
+
+    # refocused image distance of chief rays
+    K = pm*fs/pp
+    T = a*(M-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        b_new = bU + K*T/(M-1 - T*K/dA)
+
+    # is refocused object plane at or beyond infinity?
+    plane_mask = ~((bU >= fU) & (b_new > fU))
+
+    flags = np.zeros(np.broadcast(a, bU, M, pm, pp, fs, dA, fU, obj_mask).shape, dtype=np.uint16)
+    for flag, mask in ((Flag.OBJ_DIST, obj_mask), (Flag.IMG_DIST, np.greater(fU, bU)), (Flag.SLICE_RANGE, a >= M),
+                       (Flag.PLANE_INF, plane_mask & (b_new == fU)), (Flag.PLANE_RANGE, plane_mask & (b_new != fU))):
+        flags[np.broadcast_to(mask, flags.shape)] |= np.uint16(flag)
+
+    return flags
+
+
+def refo_inv_vec(d, bU, M, pm, pp, fs, dA, fU, HH):
+    ''' This function inverts :func:`refo_vec()` to obtain the shift parameter :math:`a` focusing at distance
+    :math:`d_a`. Intersecting the two chief rays behind the sensor gives an image distance
+    :math:`b_U + \\frac{a K}{1-a K/d_{A\'}}` with :math:`K = \\frac{p_m f_s}{p_p}`, which is monotonic in
+    :math:`a` and solved in closed form after mapping :math:`d_a` to the image side by the thin lens equation.
+
+    :param d: target refocusing distances
+    :param bU: main lens image distance
+    :param M: 1-D micro image diameter
+    :param pm: micro lens pitch
+    :param pp: pixel pitch
+    :param fs: focal length of micro lens
+    :param dA: exit pupil distance
+    :param fU: focal length of objective lens
+    :param HH: principal plane spacing in objective lens
+    :type d: :class:`~numpy:numpy.ndarray`
+
+    :return: **a** (NaN if unreachable), uint16 **flags** with :attr:`Flag.PLANE_INF` for targets at infinity,
+        :attr:`Flag.PLANE_RANGE` for unreachable targets and :attr:`Flag.SLICE_RANGE` for shifts out of range
+    :rtype: tuple of :class:`~numpy:numpy.ndarray`
+
+    '''
+
+    d = np.asarray(d, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # refocused image distance behind the main lens
+        aU = d-bU-HH
+        b_new = np.where(np.isinf(d), fU, (1/fU-1/aU)**-1)
+
+        # shift parameter from sensor side intersection
+        K = pm*fs/pp
+        t = b_new-bU
+        a = t*dA/(K*(dA+t))
+
+    # is target at infinity or not behind the object side focal plane so that no real image can be refocused?
+    inf_mask = np.isinf(d) & (d > 0)
+    range_mask = ~(aU > fU) & ~inf_mask
+    a = np.where(range_mask, float('nan'), a)
+
+    flags = np.zeros(np.shape(a), dtype=np.uint16)
+    for flag, mask in ((Flag.PLANE_INF, inf_mask), (Flag.PLANE_RANGE, range_mask), (Flag.SLICE_RANGE, a >= M)):
+        flags[np.broadcast_to(mask, flags.shape)] |= np.uint16(flag)
+
+    return a, flags
+
+
+def validate_vec(a, bU, M, pm, pp, fs, dA, fU, HH, outputs=None, step=1, res=None):
+    ''' This function pairs refocusing distances and depth of field borders from object side ray intersections
+    (see :func:`refo_vec()`) with those from image side intersections mapped by the thin lens equation (see
+    :func:`refo_ana_vec()`) for validation of every step-th element. Object side results of all elements that have
+    already been computed are passed as res and sampled instead of being traced again.
+
+    :param a: refocusing shift parameter
+    :param bU: main lens image distance
+    :param M: 1-D micro image diameter
+    :param pm: micro lens pitch
+    :param pp: pixel pitch
+    :param fs: focal length of micro lens
+    :param dA: exit pupil distance
+    :param fU: focal length of objective lens
+    :param HH: principal plane spacing in objective lens
+    :param outputs: names of requested result fields where None requests all
+    :param step: step between validated elements of the flattened broadcast arrays
+    :param res: results of :func:`refo_vec()` for all elements incl. depth of field borders if dof is requested
+    :type a: :class:`~numpy:numpy.ndarray`
+    :type outputs: iterable of str
+    :type step: int
+    :type res: :class:`RefoResult`
+
+    :return: pairs of object and image side **d**, **d_p** and **d_m** as far as computed
+    :rtype: tuple
+
+    '''
+
+    # depth of field is validated by its borders
+    out = select(outputs, RefoResult)
+    need = out | {'d_p', 'd_m'} if 'dof' in out else out
+
+    a = sample(np.broadcast_to(a, np.broadcast(a, bU, M, pm, pp, fs, dA, fU, HH).shape), step)
+    obj = refo_vec(a, bU, M, pm, pp, fs, dA, fU, HH, need) if res is None else [
+        None if x is None else sample(x, step) for x in res[:3]]
+    img = refo_ana_vec(a, bU, M, pm, pp, fs, dA, fU, HH, need)
+
+    return tuple((x, y) for x, y in zip(obj[:3], img[:3]) if x is not None)
+
+
+def _rays(j, i, pm, pp, fs, dA, bU, fU):
+    ''' compute chief rays for micro lens index j and pixel index i '''
+
+    # for pixel centres
+    s = j*pm
+    mc = -s/dA
+    uc = -mc*fs+s
+    u = uc+i*pp
+    mij = (s-u)/fs
+    Uij = mij*bU+s
+    qij = (mij*fU-Uij)/fU
+
+    return s, u, mij, Uij, qij
+
+
+def _border_rays(s, mij, pm, pp, fs, bU, fU):
+    ''' compute pixel border rays from chief ray slope mij and micro lens position s '''
+
+    # for pixel borders (DoF rays)
+    sU = s+pm/2
+    sL = s-pm/2
+    mijU = mij-pp/2/fs
+    mijL = mij+pp/2/fs
+    UijU = mijU*bU+sU
+    UijL = mijL*bU+sL
+    qijU = (mijU*fU-UijU)/fU
+    qijL = (mijL*fU-UijL)/fU
+
+    return sU, sL, mijU, mijL, UijU, UijL, qijU, qijL
+
+
+def _check_method(method):
+    ''' raise error for unknown refocusing method '''
+
+    if method not in REFO_METHODS:
+        raise PlenoptisignError('Unknown refocusing method %s' % method)
 
 
 class Mixin:
 
-    def refo(self):
+    def refo(self, method='raytrace', outputs=None):
         ''' This method computes the distance :math:`d_a` and depth of field limits :math:`d_{a\\pm }`
-        of a plane that is computationally focused based on a standard plenoptic camera. The instance variables that
-        are mutated are as follows
+        of a plane that is computationally focused based on a standard plenoptic camera by means of :func:`core.refo()`
+        or :func:`core.refo_scalar()` for plain numbers. The 'analytic' method evaluates closed-form expressions
+        instead (see :func:`core.refo_analytic()`) and leaves the rays for plotting untouched. Ray intersections are
+        validated as set by the :attr:`validate` policy. Given **outputs**, only the requested results and their
+        dependencies are computed while other results keep their previous values. The instance variables that are
+        mutated are as follows
 
+        :param method: 'raytrace' or 'analytic'
+        :param outputs: names of requested result fields where None requests all
         :param d: refocusing distance
         :param d_p: far depth of field border in refocusing
         :param d_m: near depth of field border in refocusing
         :param dof: depth of field
+        :type method: str
+        :type outputs: iterable of str
         :type d: float
         :type d_p: float
         :type d_m: float
@@ -46,136 +369,89 @@ class Mixin:
 
         '''
 
-        # local variable initialization
-        j, i, mc, mij, qij, mU, mL, mijU, mijL, FijL, FijU, qijU, qijL, d_n, d_p_n, d_m_n = [np.zeros(2) for _ in range(16)]
-
-        # compute main lens image distance
-        self.compute_img_dist()
-
-        # (s,u) coordinates for the intersecting rays
-        smax = 2*self.M+1
-        self._sc = (smax-1)/2
-
-        # warnings
-        if self.fU > self.bU:
-            self.console_msg = 'Image distance is smaller than focal length'
-        elif self.a >= (smax-1)/2:
-            self.console_msg = 'Refocusing slice a %0.1f is out of range' % self.a
-
-        # align intersection to be as paraxial as possible
-        c = (self.M-1)/2
-        j[0] = -np.round(self.a*(self.M-1)/2, DEC_P)
-        j[1] = self.a*(self.M-1)+j[0]
-
-        # set starting positions for micro lens s and pixel u
-        for k in range(2):
-            # for pixel centres
-            self._s[k] = j[k]*self.pm
-            mc[k] = -self._s[k]/self.dA
-            self._uc[k] = -mc[k]*self.fs+self._s[k]
-            i[k] = c if k == 0 else -c
-            self._u[k] = self._uc[k]+i[k]*self.pp
-            mij[k] = (self._s[k]-self._u[k])/self.fs
-            self._Uij[k] = mij[k]*self.bU+self._s[k]
-            self._Fij[k] = mij[k]*self.fU
-            qij[k] = (self._Fij[k]-self._Uij[k])/self.fU
-
-            # for pixel borders (DoF rays)
-            self._uU[k] = self._u[k]+self.pp/2
-            self._uL[k] = self._u[k]-self.pp/2
-            self._sU[k] = self._s[k]+self.pm/2
-            self._sL[k] = self._s[k]-self.pm/2
-            mU[k] = (self._sU[k]-self._uU[k])/self.fs
-            mL[k] = (self._sL[k]-self._uL[k])/self.fs
-            mijU[k] = (self._s[k]-self._uU[k])/self.fs
-            mijL[k] = (self._s[k]-self._uL[k])/self.fs
-            self._UijU[k] = mijU[k]*self.bU+self._sU[k]
-            self._UijL[k] = mijL[k]*self.bU+self._sL[k]
-            FijU[k] = mijU[k]*self.fU
-            FijL[k] = mijL[k]*self.fU
-            qijU[k] = (FijU[k]-self._UijU[k])/self.fU
-            qijL[k] = (FijL[k]-self._UijL[k])/self.fU
+        _check_method(method)
+        out = select(outputs, RefoResult)
 
-        # ray intersections behind image sensor
-        b_new = self.bU-solve_sle(np.array([[-mij[0], 1], [-mij[1], 1]]), np.array([self._s[0], self._s[1]]))[0]
-        b_new_m = self.bU-solve_sle(np.array([[-mijL[0], 1], [-mijU[1], 1]]), np.array([self._sL[0], self._sU[1]]))[0]
-        b_new_p = self.bU-solve_sle(np.array([[-mijU[0], 1], [-mijL[1], 1]]), np.array([self._sU[0], self._sL[1]]))[0]
-
-        # is refocused object plane not at infinity?
-        if self.bU >= self.fU and b_new > self.fU:
-            # get distances from refocused image side planes
-            d_n = (1/self.fU-1/b_new)**-1+self.bU+self.HH
-            d_p_n = (1/self.fU-1/b_new_p)**-1+self.bU+self.HH
-            d_m_n = (1/self.fU-1/b_new_m)**-1+self.bU+self.HH
-
-            # solve for ray intersections in object space to obtain distances and DoF
-            self.d = solve_sle(np.array([[-qij[0], 1], [-qij[1], 1]]), np.array([self._Uij[0], self._Uij[1]]))[0]\
-                                + self.bU+self.HH
-            self.d_p = solve_sle(np.array([[-qijU[0], 1], [-qijL[1], 1]]), np.array([self._UijU[0], self._UijL[1]]))[0]\
-                                + self.bU+self.HH
-            self.d_m = solve_sle(np.array([[-qijL[0], 1], [-qijU[1], 1]]), np.array([self._UijL[0], self._UijU[1]]))[0]\
-                                + self.bU+self.HH
-            self.dof = self.d_p-self.d_m
-
-            # is far depth of field border at infinity?
-            if self.fU >= b_new_p:
-                self.d_p = float('Inf')
-                self.dof = float('Inf')
-
-        # is refocused object plane at infinity?
-        elif b_new is self.fU or (self.fU is self.bU and self.a is 0):
-            self.console_msg = 'Refocused object plane a=%0.1f at infinity' % self.a
-            self.d = float('Inf')
-            d_n = float('Inf')
-            self.d_p = float('Inf')
-            d_p_n = float('Inf')
-            # check if narrow depth of field border at infinity
-            if b_new_m <= self.fU:
-                self.d_m = float('Inf')
-                d_m_n = float('Inf')
-                self.dof = float('Inf')
+        # restore stored state for unchanged input parameters or evaluate pure function otherwise
+        key = self._cache_key(('refo_'+method, out), REFO_INPUTS)
+        state = self._cache.get(key)
+        if state is None:
+            params = self.params
+            if method == 'analytic':
+                state = core.refo_analytic(params, outputs=out)
+            # full evaluations reuse unaffected stages of the scalar engine
+            elif outputs is None:
+                state = self._graph.value('refo', params, validate=self._validate_next)
             else:
-                self.d_m = solve_sle(np.array([[-qijL[0], 1], [-qijU[1], 1]]),
-                                     np.array([self._UijL[0], self._UijU[1]]))[0]+self.bU+self.HH
-                d_m_n = (1/self.fU-1/b_new_m)**-1+self.bU+self.HH
-                self.dof = self.d_p-self.d_m
-        # is refocused object plane beyond infinity?
-        elif b_new < self.fU or (self.bU <= self.fU and self.a <= 0):
-            self.console_msg = 'Refocused object plane a=%0.1f out of range' % self.a
-            self.d = float('Inf')
-            d_n = float('Inf')
-            # is narrow depth of field border at infinity?
-            if b_new_m < self.fU:
-                self.d_m = float('Inf')
-                d_m_n = float('Inf')
-                self.dof = float('Inf')
-            elif self.fU is b_new_m:
-                self.d_m = float('Inf')
-                d_m_n = float('Inf')
-                self.dof = float('Inf')
-            else:
-                self.d_m = solve_sle(np.array([[-qijL[0], 1], [-qijU[1], 1]]),
-                                     np.array([self._UijL[0], self._UijU[1]]))[0]+self.bU+self.HH
-                d_m_n = (1/self.fU-1/b_new_m)**-1+self.bU+self.HH
-                self.dof = self.d_p-self.d_m
-            # is farther depth of field border at infinity? (redundant since central plane already at infinity)
-            if b_new_p < self.fU:
-                self.d_p = float('Inf')
-                d_p_n = float('Inf')
-                self.dof = float('Inf')
-            elif b_new_p is self.fU:
-                self.d_m = float('Inf')
-                d_m_n = float('Inf')
-                self.dof = float('Inf')
-            else:
-                self.d_p = solve_sle(np.array([[-qijU[0], 1], [-qijL[1], 1]]),
-                                     np.array([self._UijU[0], self._UijL[1]]))[0]+self.bU+self.HH
-                d_p_n = (1/self.fU-1/b_new_p)**-1+self.bU+self.HH
-
-        # comparison of image and object side approach (for debugging purposes)
-        if not (np.equal(round(d_n, DEC_P), round(self.d, DEC_P)) or
-                np.equal(round(d_p_n, DEC_P), round(self.d_p, DEC_P)) or
-                np.equal(round(d_m_n, DEC_P), round(self.d_m, DEC_P))):
-            raise PlenoptisignError('Results for object and image side intersections are different')
+                state = core.refo_scalar(params, validate=self._validate_next(), outputs=out)
+            self._cache.put(key, state)
+        self._set_state(state)
 
         return True
+
+    def refo_batch(self, a, method='raytrace', return_flags=False, outputs=None):
+        ''' This method computes the refocusing distance :math:`d_a` and depth of field limits :math:`d_{a\\pm }`
+        for an array of shift parameters :math:`a` in one vectorized pass (see :func:`refo_vec()` and
+        :func:`refo_ana_vec()` for the 'analytic' method). Unlike :func:`refo()`, no results, rays or warning message
+        of the instance are set. Object and image side intersections are compared at every step-th shift parameter as
+        set by the validation policy, reusing traced results of the 'raytrace' method, and the aggregate deviations
+        are stored in :attr:`validation` instead of raising an error.
+
+        :param a: refocusing shift parameters
+        :param method: 'raytrace' or 'analytic'
+        :param return_flags: additionally return warning flags per element (see :func:`refo_flags_vec()`)
+        :param outputs: names of requested result fields where None requests all
+        :type a: :class:`~numpy:numpy.ndarray`
+        :type method: str
+        :type return_flags: bool
+        :type outputs: iterable of str
+
+        :return: **d**, **d_p**, **d_m**, **dof** with None for fields not requested and optionally uint16 **flags**
+        :rtype: :class:`RefoResult` of :class:`~numpy:numpy.ndarray`
+
+        '''
+
+        _check_method(method)
+
+        # main lens image distance without altering instance variables
+        bU, obj_mask = solve_img_dist(self.df, self.fU, self.HH)
+
+        # depth of field is validated by its borders
+        step = policy_step(self.validate)
+        out = select(outputs, RefoResult)
+        need = out | {'d_p', 'd_m'} if step and 'dof' in out else out
+
+        func = refo_ana_vec if method == 'analytic' else refo_vec
+        res = func(a, bU, self.M, self.pm, self.pp, self.fs, self.dA, self.fU, self.HH, need)
+
+        # validate sampled shift parameters where ray traced results are reused
+        if step:
+            pairs = validate_vec(a, bU, self.M, self.pm, self.pp, self.fs, self.dA, self.fU, self.HH, outputs,
+                                 step, res if method == 'raytrace' else None)
+            self.validation = deviation_stats(*pairs)
+        res = pick(RefoResult, out, res)
+
+        if return_flags:
+            return res, refo_flags_vec(a, bU, self.M, self.pm, self.pp, self.fs, self.dA, self.fU, obj_mask)
+
+        return res
+
+    def solve_a_for_distance(self, d_target):
+        ''' This method computes the shift parameter :math:`a` for which :func:`refo()` yields the refocusing distance
+        :math:`d_a` given as target (see :func:`refo_inv_vec()`).
+
+        :param d_target: target refocusing distances
+        :type d_target: :class:`~numpy:numpy.ndarray`
+
+        :return: **a** (NaN if unreachable) and uint16 **flags** telling targets at infinity apart from unreachable
+            targets and shifts out of range (see :func:`refo_inv_vec()`)
+        :rtype: tuple of :class:`~numpy:numpy.ndarray`
+
+        '''
+
+        # main lens image distance without altering instance variables
+        bU = solve_img_dist(self.df, self.fU, self.HH)[0]
+
+        a, flags = refo_inv_vec(d_target, bU, self.M, self.pm, self.pp, self.fs, self.dA, self.fU, self.HH)
+
+        return a[()], flags[()]
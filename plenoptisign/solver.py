@@ -38,8 +38,22 @@ def solve_sle(A, b):
 
     :return: **x**
 
+    .. note::
+        Single :math:`2 \\times 2` systems are solved by Cramer's rule (see :func:`solve_sle_2x2()` for stacks).
+        Singular systems raise a :class:`~numpy:numpy.linalg.LinAlgError`.
+
     """
 
+    A, b = np.asarray(A, dtype=float), np.asarray(b, dtype=float)
+
+    if A.shape == (2, 2) and b.shape == (2,):
+        (a11, a12), (a21, a22) = A.tolist()
+        b1, b2 = b.tolist()
+        det = a11*a22 - a12*a21
+        if det == 0:
+            raise np.linalg.LinAlgError('Singular matrix')
+        return np.array([(b1*a22 - a12*b2) / det, (a11*b2 - b1*a21) / det])
+
     if is_square(A):
         A_inv = np.linalg.inv(A)
     else:
@@ -48,7 +62,88 @@ def solve_sle(A, b):
     return np.dot(A_inv, b)
 
 
+def solve_sle_2x2(A, b):
+    """
+
+    This function solves stacked systems of linear equations :math:`Ax=b` with :math:`2 \\times 2` matrices by
+    Cramer's rule, i.e. without matrix inversion. It is intended for the intersection of many ray pairs at once.
+    Singular systems (e.g. parallel rays) are flagged in a mask and yield NaN instead of raising an error.
+
+    :param A: :math:`N \\times 2 \\times 2` matrices (any leading shape)
+    :param b: :math:`N \\times 2` right-hand side vectors (any leading shape)
+    :type A: :class:`~numpy:numpy.ndarray`
+    :type b: :class:`~numpy:numpy.ndarray`
+
+    :return: **x** of shape :math:`N \\times 2`, **mask** of shape :math:`N` where True denotes a singular system
+
+    """
+
+    A, b = np.asarray(A, dtype=float), np.asarray(b, dtype=float)
+
+    det = A[..., 0, 0]*A[..., 1, 1] - A[..., 0, 1]*A[..., 1, 0]
+    mask = (det == 0) | ~np.isfinite(det)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = np.stack([(b[..., 0]*A[..., 1, 1] - A[..., 0, 1]*b[..., 1]) / det,
+                      (A[..., 0, 0]*b[..., 1] - b[..., 0]*A[..., 1, 0]) / det], axis=-1)
+    x[mask] = float('nan')
+
+    return x, mask[()]
+
+
+def sle_rays(m0, m1, y0, y1):
+    """ stack coefficients of two rays :math:`y = m z + y_0` to matrices and vectors for :func:`solve_sle_2x2()` """
+
+    m0, m1, y0, y1 = np.broadcast_arrays(m0, m1, y0, y1)
+    one = np.ones(m0.shape)
+    A = np.stack([np.stack([-m0, one], axis=-1), np.stack([-m1, one], axis=-1)], axis=-2)
+    b = np.stack([y0, y1], axis=-1)
+
+    return A, b
+
+
+def solve_img_dist(df, fU, HH):
+    """
+
+    This function computes the main lens image distance :math:`b_U` in closed form. Substituting the object distance
+    :math:`a_U = d_f - b_U - H_{1U}H_{2U}` in the thin lens equation :math:`\\frac{1}{f_U} = \\frac{1}{a_U} +
+    \\frac{1}{b_U}` yields a quadratic equation whose root next to :math:`f_U` is
+
+    :math:`b_U = \\frac{2 f_U}{1+\\sqrt{1-4 f_U/L}}` with :math:`L = d_f - H_{1U}H_{2U}`.
+
+    If the object is too close for a real image (:math:`L < 4 f_U`), the real part :math:`L/2` of the complex roots is
+    returned and the element is flagged. Objects at or within the focal length are imaged at infinity. Inputs may be
+    scalars or arrays of any compatible shape.
+
+    :param df: object distance
+    :param fU: focal length of objective lens
+    :param HH: principal plane spacing in objective lens
+    :type df: :class:`~numpy:numpy.ndarray`
+    :type fU: :class:`~numpy:numpy.ndarray`
+    :type HH: :class:`~numpy:numpy.ndarray`
+
+    :return: **bU**, **mask** where True denotes an object distance smaller than the image distance
+
+    """
+
+    df, fU, HH = (np.asarray(x, dtype=float) for x in (df, fU, HH))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # total conjugate distance and discriminant of the quadratic
+        L = df - HH
+        disc = 1 - 4*fU/L
+        bU = np.where(disc >= 0, 2*fU/(1+np.sqrt(np.abs(disc))), L/2)
+
+    # is object distance smaller than image distance?
+    mask = (df > fU) & ((disc < 0) | (L - bU < 0))
+
+    # is image distance at infinity?
+    bU = np.where(df > fU, bU, float('inf'))
+
+    return bU[()], mask[()]
+
+
 def is_square(A):
     """ check if matrix is square """
 
-    return all(len(row) == len(A) for row in A)
+    return np.ndim(A) >= 2 and np.shape(A)[-1] == np.shape(A)[-2]
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+
+__author__ = "Christopher Hahne"
+__email__ = "inbox@christopherhahne.de"
+__license__ = """
+Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import numpy as np
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from .records import CameraParams, RefoResult, TriaResult
+from .refo import refo_vec, refo_flags_vec
+from .tria import tria_vec
+from .solver import solve_img_dist
+from .constants import ABBS, RABB, PlenoptisignError
+
+# parameters that can be varied in a sweep
+KEYS = [key for key in ABBS if key != 'sd']
+
+
+class SweepResult(object):
+    """ The SweepResult holds the outcome of :func:`run()` on a labelled grid.
+
+    :param axes: dictionary mapping each swept parameter to its 1-D array in grid order
+    :param values: structured array of grid shape with one field per requested result of :data:`RABB` and uint16 'flags'
+    :param shm: shared memory block backing values of parallel runs which is owned and released by this result
+    :type axes: dict
+    :type values: :class:`~numpy:numpy.ndarray`
+    :type shm: :class:`~multiprocessing.shared_memory.SharedMemory`
+
+    Usage example::
+
+        >> res = plenoptisign.sweep.run({'a': np.linspace(0, 4, 41), 'fU': [100, 150, 200]})
+        >> res['d'].shape
+        (41, 3)
+
+    Results of parallel runs reside in shared memory, which is unlinked by :func:`close()`, on leaving a with
+    statement or when the result is garbage collected. Arrays taken from the result beforehand remain valid and the
+    memory is unmapped once the last of them is deleted.
+
+    """
+
+    def __init__(self, axes, values, shm=None):
+
+        self.axes = axes
+        self.values = values
+        self._shm = shm
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        ''' unlink shared memory of parallel runs after which values are no longer accessible from this result '''
+
+        shm, self._shm = getattr(self, '_shm', None), None
+        if shm is not None:
+            self.values = None
+            shm.unlink()
+
+        return True
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def __getitem__(self, key):
+        ''' return result field or swept parameter broadcast to grid shape '''
+
+        if key in self.axes:
+            idx = list(self.axes).index(key)
+            return np.broadcast_to(np.expand_dims(self.axes[key], tuple(range(1, len(self.axes)-idx))), self.shape)
+
+        return self.values[key]
+
+
+def run(grid, data=None, chunk_size=2**16, workers=None, outputs=None):
+    """
+
+    This function evaluates :func:`refo()` and :func:`tria()` for every combination of the parameter arrays given in
+    grid. The Cartesian product is processed in chunks of flat grid indices so that memory use of intermediate
+    arrays is bounded by the chunk size rather than by the number of combinations.
+
+    :param grid: dictionary mapping keys of :data:`ABBS` to 1-D arrays
+    :param data: dictionary of fixed input parameters (see :class:`MainClass`) for keys not present in grid
+    :param chunk_size: number of combinations evaluated at once
+    :param workers: number of processes evaluating chunks in parallel (sequential if None)
+    :param outputs: result fields of :data:`RABB` to be computed and stored (all if None)
+    :type grid: dict
+    :type data: dict
+    :type chunk_size: int
+    :type workers: int
+    :type outputs: iterable of str
+
+    :return: **result**
+    :rtype: :class:`SweepResult`
+
+    .. note::
+        As in the GUI, the micro image resolution :math:`M` follows from a swept F-number
+        (see :func:`compute_mic_img_size()`) unless :math:`M` is given in grid as well.
+
+    .. note::
+        With workers, chunks are distributed to a :class:`~concurrent.futures.ProcessPoolExecutor`. Workers only
+        receive plain parameter dictionaries and write their results to a shared memory buffer so that no results
+        are pickled back to the calling process. The returned result is backed by this buffer without a copy
+        (see :class:`SweepResult`).
+
+    """
+
+    for key in grid:
+        if key not in KEYS:
+            raise PlenoptisignError('Parameter %s cannot be swept' % key)
+
+    axes = dict((key, np.atleast_1d(np.asarray(grid[key], dtype=float))) for key in grid)
+    for key in axes:
+        if axes[key].ndim != 1:
+            raise PlenoptisignError('Grid of parameter %s is not 1-D' % key)
+
+    # requested result fields in order of RABB
+    keys = _fields(outputs)
+
+    # fixed parameters
+    params = _params(data)
+
+    shape = tuple(len(axes[key]) for key in axes)
+    dtype = np.dtype([(key, float) for key in keys] + [('flags', np.uint16)])
+    size = int(np.prod(shape))
+    chunks = [(start, min(start+chunk_size, size)) for start in range(0, size, chunk_size)]
+
+    if workers is None or workers < 2:
+        values = np.empty(shape, dtype=dtype)
+        for start, stop in chunks:
+            _eval_chunk(params, axes, shape, start, stop, values.reshape(-1))
+        return SweepResult(axes, values)
+
+    # preallocate output buffer shared with worker processes
+    shm = shared_memory.SharedMemory(create=True, size=max(size*dtype.itemsize, 1))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_eval_shared, shm.name, params, axes, shape, dtype, start, stop)
+                       for start, stop in chunks]
+            for future in futures:
+                future.result()
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+
+    # unmap shared memory once the buffer of the last array viewing it is released
+    values = np.frombuffer(shm.buf, dtype=dtype, count=size)
+    weakref.finalize(values.base, shm.close).atexit = False
+
+    return SweepResult(axes, values.reshape(shape), shm)
+
+
+def _params(data=None):
+    ''' read fixed parameters as plain dictionary from CameraParams defaults '''
+
+    params = CameraParams.coerce(data).to_dict()
+    params.pop('sd')
+
+    return params
+
+
+def _fields(outputs=None):
+    ''' requested result fields in order of RABB '''
+
+    fields = RABB if outputs is None else (outputs,) if isinstance(outputs, str) else tuple(outputs)
+    if not fields or not set(fields).issubset(RABB):
+        raise PlenoptisignError('Invalid outputs %s for sweep' % (outputs,))
+
+    return tuple(key for key in RABB if key in fields)
+
+
+def _eval_chunk(params, axes, shape, start, stop, out):
+    ''' evaluate flat grid indices from start to stop and write results to out '''
+
+    # gather parameter values of this chunk
+    idxs = np.unravel_index(np.arange(start, stop), shape)
+    p = dict(params)
+    for key, idx in zip(axes, idxs):
+        p[key] = axes[key][idx]
+
+    keys = [key for key in RABB if key in out.dtype.names]
+    res, flags = _eval(p, axes, keys)
+    for key in keys:
+        out[key][start:stop] = res[key]
+    out['flags'][start:stop] = flags
+
+    return True
+
+
+def _eval(p, varied, keys):
+    ''' evaluate result fields given by keys and flags for parameter dictionary p of arrays varying in given keys '''
+
+    if 'f_num' in varied and 'M' not in varied:
+        p['M'] = p['fs']/(p['f_num']*p['pp'])
+
+    # compute main lens image distance
+    bU, obj_mask = solve_img_dist(p['df'], p['fU'], p['HH'])
+
+    # evaluate only the functions of requested result fields
+    refo_out = [key for key in keys if key in RefoResult._fields]
+    tria_out = [key for key in keys if key in TriaResult._fields]
+    res = dict()
+    if refo_out:
+        res.update(refo_vec(p['a'], bU, p['M'], p['pm'], p['pp'], p['fs'], p['dA'], p['fU'], p['HH'],
+                            refo_out)._asdict())
+    if tria_out:
+        res.update(tria_vec(p['G'], p['dx'], bU, p['pm'], p['pp'], p['fs'], p['dA'], p['fU'], p['HH'],
+                            tria_out)._asdict())
+
+    flags = refo_flags_vec(p['a'], bU, p['M'], p['pm'], p['pp'], p['fs'], p['dA'], p['fU'], obj_mask)
+
+    return res, flags
+
+
+def _eval_shared(name, params, axes, shape, dtype, start, stop):
+    ''' worker process entry point writing results of one chunk to the shared memory buffer '''
+
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        out = np.ndarray((int(np.prod(shape)),), dtype=dtype, buffer=shm.buf)
+        _eval_chunk(params, axes, shape, start, stop, out)
+        del out
+    finally:
+        shm.close()
+
+    return True
@@ -21,19 +21,218 @@ Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
 """
 
 import numpy as np
-from .solver import solve_sle
+from .solver import solve_sle_2x2, sle_rays, solve_img_dist
+from . import core
+from .records import TriaResult, Viewpoints, ViewpointPairs, DepthResolution, select, pick
+from .validation import policy_step, sample, deviation_stats
 from . import constants as c
 
+# input parameters of tria() used for caching
+TRIA_INPUTS = ('pp', 'fs', 'pm', 'dA', 'fU', 'HH', 'df', 'G', 'dx')
+
+
+def tria_vec(G, dx, bU, pm, pp, fs, dA, fU, HH, outputs=None):
+    ''' This function is the vectorized counterpart of :func:`tria()`. All arguments are broadcast against each other
+    so that baseline, tilt angle and triangulation distance are obtained for whole arrays in a single pass. Depth planes
+    at infinity are handled by element-wise masks. Triangulation is skipped unless **Z** is requested. Results are not
+    validated here (see :func:`validate_vec()`).
+
+    :param G: viewpoint gap
+    :param dx: disparity value
+    :param bU: main lens image distance
+    :param pm: micro lens pitch
+    :param pp: pixel pitch
+    :param fs: focal length of micro lens
+    :param dA: exit pupil distance
+    :param fU: focal length of objective lens
+    :param HH: principal plane spacing in objective lens
+    :param outputs: names of requested result fields where None requests all
+    :type G: :class:`~numpy:numpy.ndarray`
+    :type dx: :class:`~numpy:numpy.ndarray`
+    :type outputs: iterable of str
+
+    :return: **B**, **phi**, **Z** where fields not requested are None
+    :rtype: :class:`TriaResult` of :class:`~numpy:numpy.ndarray`
+
+    '''
+
+    out = select(outputs, TriaResult)
+    G, dx = np.asarray(G, dtype=float), np.asarray(dx, dtype=float)
+
+    # locate object side related virtual camera position and its orientation
+    qij, Uij, intersect, B, phi = _viewpoint(G, bU, pm, pp, fs, dA, fU)
+
+    # triangulation
+    Z = triangulate(dx, B, phi, _pp_new(qij, B, bU), bU, fU) if 'Z' in out else None
+
+    # fields broadcast against all arguments whether or not they enter each of them
+    shape = np.broadcast(G, dx, bU, pm, pp, fs, dA, fU, HH).shape
+    vals = [None if val is None else np.broadcast_to(val, shape) for val in (B, phi, Z)]
+
+    return pick(TriaResult, out, vals)
+
+
+def tria_inv_vec(Z, G, bU, pm, pp, fs, dA, fU, HH):
+    ''' This function inverts :func:`tria_vec()` to obtain the disparity :math:`\\Delta x` that triangulates to depth
+    :math:`Z_{(G, \\Delta x)}`. Baseline and tilt angle are computed once per viewpoint gap and broadcast against the
+    depth values.
+
+    :param Z: target triangulation distances
+    :param G: viewpoint gap
+    :param bU: main lens image distance
+    :param pm: micro lens pitch
+    :param pp: pixel pitch
+    :param fs: focal length of micro lens
+    :param dA: exit pupil distance
+    :param fU: focal length of objective lens
+    :param HH: principal plane spacing in objective lens
+    :type Z: :class:`~numpy:numpy.ndarray`
+    :type G: :class:`~numpy:numpy.ndarray`
+
+    :return: **dx**
+    :rtype: :class:`~numpy:numpy.ndarray`
+
+    '''
+
+    Z, G = np.asarray(Z, dtype=float), np.asarray(G, dtype=float)
+
+    qij, Uij, intersect, B, phi = _viewpoint(G, bU, pm, pp, fs, dA, fU)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dx = (B * bU / Z + bU * np.tan(np.radians(phi))) / _pp_new(qij, B, bU)
+
+    return dx
+
+
+def triangulate(dx, B, phi, pp_new, bU, fU):
+    ''' This function computes the triangulation distance :math:`Z_{(G, \\Delta x)}` from disparities and
+    precomputed per-viewpoint constants, which allows these to be reused across many disparity values.
+
+    :param dx: disparity values
+    :param B: baseline at entrance pupil of the main lens
+    :param phi: tilt angle of virtual camera
+    :param pp_new: pixel pitch projected to the main lens image plane
+    :param bU: main lens image distance
+    :param fU: focal length of objective lens
+    :type dx: :class:`~numpy:numpy.ndarray`
+
+    :return: **Z**
+    :rtype: :class:`~numpy:numpy.ndarray`
+
+    '''
+
+    dx = np.asarray(dx)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        b_new = bU
+        dx_new = dx * pp_new
+        Z = B * b_new / (dx_new + b_new * -np.tan(np.radians(phi)))
+
+    # is depth plane at infinity?
+    inf_mask = (bU <= fU) & (dx <= 0)
+    Z = np.where(inf_mask, float('inf'), np.where(bU >= fU, Z, float('nan')))
+
+    return Z
+
+
+def viewpoint_vec(G, bU, pm, pp, fs, dA, fU, HH):
+    ''' This function computes baseline :math:`B_G`, tilt angle :math:`\\Phi_G` and the longitudinal entrance pupil
+    position of virtual cameras for an array of viewpoint gaps in one vectorized pass. Other than :func:`tria_vec()`,
+    no disparity is involved.
+
+    :param G: viewpoint gap
+    :param bU: main lens image distance
+    :param pm: micro lens pitch
+    :param pp: pixel pitch
+    :param fs: focal length of micro lens
+    :param dA: exit pupil distance
+    :param fU: focal length of objective lens
+    :param HH: principal plane spacing in objective lens
+    :type G: :class:`~numpy:numpy.ndarray`
+
+    :return: **B**, **phi**, **ent_pup_pos**
+    :rtype: tuple of :class:`~numpy:numpy.ndarray`
+
+    '''
+
+    qij, Uij, intersect, B, phi = _viewpoint(np.asarray(G, dtype=float), bU, pm, pp, fs, dA, fU)
+
+    # longitudinal entrance pupil position
+    ent_pup_pos = bU + HH + intersect
+
+    return B, phi, ent_pup_pos
+
+
+def validate_vec(G, bU, pm, pp, fs, dA, fU):
+    ''' This function pairs the baseline :math:`B_G` from intersecting object side rays with the baseline obtained
+    from the entrance pupil intersection and the first ray for validation.
+
+    :param G: viewpoint gap
+    :param bU: main lens image distance
+    :param pm: micro lens pitch
+    :param pp: pixel pitch
+    :param fs: focal length of micro lens
+    :param dA: exit pupil distance
+    :param fU: focal length of objective lens
+    :type G: :class:`~numpy:numpy.ndarray`
+
+    :return: pair of **B** and alternative **B**
+    :rtype: tuple
+
+    '''
+
+    qij, Uij, intersect, B, phi = _viewpoint(np.asarray(G, dtype=float), bU, pm, pp, fs, dA, fU)
+
+    with np.errstate(invalid='ignore'):
+        B_alt = qij[0] * intersect + Uij[0]
+
+    return ((B, B_alt),)
+
+
+def _viewpoint(G, bU, pm, pp, fs, dA, fU):
+    ''' compute ray slopes, main lens intersections, entrance pupil intersection, baseline and tilt angle '''
+
+    # ray geometry calculation
+    s = pm
+    mc = -(s / dA)
+    uc = -mc * fs + s
+    u = uc + pp * G
+    mij = [-pp * G / fs, (s - u) / fs]
+    Uij = [mij[k] * bU + s*k for k in range(2)]
+    qij = [(mij[k] * fU - Uij[k]) / fU for k in range(2)]
+
+    # locate object side related virtual camera position
+    x = solve_sle_2x2(*sle_rays(qij[0], qij[1], Uij[0], Uij[1]))[0]
+    intersect, B = x[..., 0], x[..., 1]
+
+    # orientation of virtual camera
+    phi = np.degrees(np.arctan(qij[0]))
+
+    return qij, Uij, intersect, B, phi
+
+
+def _pp_new(qij, B, bU):
+    ''' pixel pitch projected to the main lens image plane '''
+
+    b_new = bU
+
+    return (-qij[1] * b_new + B) - (-qij[0] * b_new + B)
+
 
 class Mixin:
 
-    def tria(self):
+    def tria(self, outputs=None):
         ''' This method computes depth plane distance :math:`Z_{(G, \\Delta x)}`, virtual camera tilt :math:`\\Phi_G`
-        and baseline :math:`B_G` of a standard plenoptic camera. The instance variables that are mutated are as follows:
+        and baseline :math:`B_G` of a standard plenoptic camera by means of :func:`core.tria()`
+        or :func:`core.tria_scalar()` for plain numbers. Baselines are validated as set by the :attr:`validate` policy.
+        Given **outputs**, only the requested results and their dependencies are computed while other results keep
+        their previous values. The instance variables that are mutated are as follows:
 
+        :param outputs: names of requested result fields where None requests all
         :param B: baseline at entrance pupil of the main lens
         :param phi: tilt angle of virtual camera
         :param Z: triangulation distance
+        :type outputs: iterable of str
         :type B: float
         :type phi: float
         :type Z: float
@@ -43,44 +242,201 @@ class Mixin:
 
         '''
 
-        # compute main lens image distance
-        self.compute_img_dist()
-
-        # ray geometry calculation
-        j = 1
-        s = j * self.pm
-        mc = -(s / self.dA)
-        uc = -mc * self.fs + s
-        self._u[0] = uc + self.pp * self.G
-        self._mij[0] = -self.pp * self.G / self.fs
-        self._mij[1] = (s - self._u[0]) / self.fs
-        for k in range(2):
-            self._Uij[k] = self._mij[k] * self.bU + s*k
-            self._qij[k] = (self._mij[k] * self.fU - self._Uij[k]) / self.fU
-
-        # locate object side related virtual camera position
-        self._intersect, self.B = solve_sle(np.array([[-self._qij[0], 1], [-self._qij[1], 1]]),
-                                            np.array([self._Uij[0], self._Uij[1]]))
-        # orientation of virtual camera
-        self.phi = np.degrees(np.arctan(self._qij[0]))
-
-        # longitudinal entrance pupil position
-        self._ent_pup_pos = self.bU + self.HH + self._intersect
-
-        # validate baseline approach (for debug purposes)
-        B_alt = self._qij[0] * self._intersect + self._Uij[0]
-        if not (np.equal(round(self.B, c.DEC_P), round(B_alt, c.DEC_P))):
-            raise c.PlenoptisignError('Baseline validation failed')
-
-        # triangulation
-        b_new = self.bU
-        self._pp_new = (-self._qij[1] * b_new + self.B) - (-self._qij[0] * b_new + self.B)
-        dx_new = np.transpose(self.dx) * self._pp_new
-
-        # is depth plane at infinity?
-        if self.bU <= self.fU and self.dx <= 0:
-            self.Z = float('inf')
-        elif self.bU >= self.fU:
-            self.Z = self.B * b_new / (dx_new + b_new * -np.tan(np.radians(self.phi)))
-
-        return True
\ No newline at end of file
+        # restore stored state for unchanged input parameters or evaluate pure function otherwise
+        out = select(outputs, TriaResult)
+        key = self._cache_key(('tria', out), TRIA_INPUTS)
+        state = self._cache.get(key)
+        if state is None:
+            # full evaluations reuse unaffected stages of the scalar engine
+            params = self.params
+            if outputs is None:
+                state = self._graph.value('tria', params, validate=self._validate_next)
+            else:
+                state = core.tria_scalar(params, validate=self._validate_next(), outputs=out)
+            self._cache.put(key, state)
+        self._set_state(state)
+
+        return True
+
+    def tria_batch(self, G, dx, return_flags=False, outputs=None):
+        ''' This method computes baseline :math:`B_G`, tilt angle :math:`\\Phi_G` and depth plane distance
+        :math:`Z_{(G, \\Delta x)}` for arrays of viewpoint gaps and disparities of any compatible shape in one
+        vectorized pass (see :func:`tria_vec()`). Unlike :func:`tria()`, no results or rays of the instance are set.
+        As baselines do not depend on disparities, only every step-th distinct viewpoint gap is validated as set by the
+        policy and aggregate deviations are stored in :attr:`validation` instead of raising an error.
+
+        :param G: viewpoint gaps
+        :param dx: disparity values
+        :param return_flags: additionally return warning flags per element (see :class:`Flag`)
+        :param outputs: names of requested result fields where None requests all
+        :type G: :class:`~numpy:numpy.ndarray`
+        :type dx: :class:`~numpy:numpy.ndarray`
+        :type return_flags: bool
+        :type outputs: iterable of str
+
+        :return: **B**, **phi**, **Z** of broadcast shape (None if not requested) and optionally uint16 **flags**
+        :rtype: :class:`TriaResult` of :class:`~numpy:numpy.ndarray`
+
+        '''
+
+        # main lens image distance without altering instance variables
+        bU, obj_mask = solve_img_dist(self.df, self.fU, self.HH)
+
+        # validate sampled distinct viewpoint gaps if baselines are involved as these do not depend on disparities
+        step = policy_step(self.validate)
+        if step and select(outputs, TriaResult) & {'B', 'Z'}:
+            pairs = validate_vec(sample(np.unique(G), step), bU, self.pm, self.pp, self.fs, self.dA, self.fU)
+            self.validation = deviation_stats(*pairs)
+
+        res = tria_vec(G, dx, bU, self.pm, self.pp, self.fs, self.dA, self.fU, self.HH, outputs)
+
+        if return_flags:
+            return res, np.full(np.broadcast(G, dx).shape, c.Flag.OBJ_DIST if obj_mask else c.Flag.OK, dtype=np.uint16)
+
+        return res
+
+    def solve_dx_for_depth(self, Z, G):
+        ''' This method computes the disparities :math:`\\Delta x` at which :func:`tria()` yields the depths
+        :math:`Z_{(G, \\Delta x)}` for each viewpoint gap (see :func:`tria_inv_vec()`).
+
+        :param Z: target triangulation distances
+        :param G: viewpoint gaps
+        :type Z: :class:`~numpy:numpy.ndarray`
+        :type G: :class:`~numpy:numpy.ndarray`
+
+        :return: **dx** of shape (len(G), len(Z))
+        :rtype: :class:`~numpy:numpy.ndarray`
+
+        '''
+
+        # main lens image distance without altering instance variables
+        bU = solve_img_dist(self.df, self.fU, self.HH)[0]
+
+        Z, G = np.atleast_1d(np.asarray(Z, dtype=float)), np.atleast_1d(np.asarray(G, dtype=float))
+
+        return tria_inv_vec(Z[None, :], G[:, None], bU, self.pm, self.pp, self.fs, self.dA, self.fU, self.HH)
+
+    def depth_resolution(self, G, dx_range, step, tol=None):
+        ''' This method computes the depth step :math:`Z_{(G, \\Delta x+\\delta)}-Z_{(G, \\Delta x)}` and its relative
+        error with respect to :math:`Z_{(G, \\Delta x)}` over a range of disparities :math:`\\Delta x` at disparity
+        step :math:`\\delta` for each viewpoint gap in a single pass of :func:`tria_batch()`. A depth plane is usable
+        where it and its neighbour are finite and positive and, given a tolerance, where the relative error stays below
+        it. The maximum usable range is the farthest usable depth and the number of distinguishable depth planes is
+        the number of usable disparities.
+
+        :param G: viewpoint gaps
+        :param dx_range: first and last disparity value
+        :param step: disparity step :math:`\\delta`
+        :param tol: maximum relative depth step of usable planes (no limit if None)
+        :type G: :class:`~numpy:numpy.ndarray`
+        :type dx_range: tuple
+        :type step: float
+        :type tol: float
+
+        :return: **dx**, **Z**, **dZ**, **rel** of shape (len(G), len(dx)) and **max_range**, **planes** per G
+        :rtype: :class:`DepthResolution`
+
+        '''
+
+        if not step > 0 or dx_range[1] < dx_range[0]:
+            raise c.PlenoptisignError('Invalid disparity range %s at step %s' % (dx_range, step))
+
+        G = np.atleast_1d(np.asarray(G, dtype=float))
+        n = int(np.floor(round((dx_range[1]-dx_range[0])/step, c.DEC_P+5)))
+        dx = np.linspace(dx_range[0], dx_range[0]+n*step, n+1)
+
+        # triangulation including neighbour of last disparity
+        Z = self.tria_batch(G[:, None], np.append(dx, dx[-1]+step)[None, :], outputs='Z').Z
+        Z, Z_next = Z[:, :-1], Z[:, 1:]
+
+        with np.errstate(invalid='ignore'):
+            dZ = Z_next - Z
+            rel = np.abs(dZ / Z)
+
+            # usable depth planes
+            mask = np.isfinite(Z) & np.isfinite(Z_next) & (Z > 0) & (Z_next > 0)
+            if tol is not None:
+                mask &= rel <= tol
+
+        max_range = np.where(mask.any(axis=-1), np.max(np.where(mask, Z, -np.inf), axis=-1, initial=-np.inf), np.nan)
+
+        return DepthResolution(dx, Z, dZ, rel, max_range, mask.sum(axis=-1))
+
+    def viewpoint_gaps(self, subpixel=1):
+        ''' This method lists all viewpoint gaps :math:`G` in :math:`[-(M-1)/2, (M-1)/2]` covered by the micro image
+        diameter :math:`M` at a step of one pixel divided by subpixel, which includes all integer viewpoint gaps.
+
+        :param subpixel: number of viewpoint gaps per pixel
+        :type subpixel: int
+
+        :return: **G** in ascending order
+        :rtype: :class:`~numpy:numpy.ndarray`
+
+        '''
+
+        if subpixel < 1 or subpixel != int(subpixel):
+            raise c.PlenoptisignError('Sub-pixel factor %s is not a positive integer' % subpixel)
+
+        n = np.floor((self.M-1)/2*subpixel)
+
+        return np.arange(-n, n+1)/subpixel
+
+    def viewpoints(self, G=None, subpixel=1):
+        ''' This method computes baseline :math:`B_G`, tilt angle :math:`\\Phi_G` and entrance pupil position of the
+        virtual camera for every viewpoint gap within the micro image (see :func:`viewpoint_gaps()`) in one vectorized
+        pass (see :func:`viewpoint_vec()`). Baselines of every step-th viewpoint gap are compared with those from the
+        entrance pupil intersection as set by the validation policy and deviations are stored in :attr:`validation`.
+
+        :param G: viewpoint gaps (all within micro image if None)
+        :param subpixel: number of viewpoint gaps per pixel if G is None
+        :type G: :class:`~numpy:numpy.ndarray`
+        :type subpixel: int
+
+        :return: **G**, **B**, **phi**, **ent_pup_pos**
+        :rtype: :class:`Viewpoints` of :class:`~numpy:numpy.ndarray`
+
+        '''
+
+        # main lens image distance without altering instance variables
+        bU = solve_img_dist(self.df, self.fU, self.HH)[0]
+
+        G = self.viewpoint_gaps(subpixel) if G is None else np.asarray(G, dtype=float)
+
+        # validate sampled viewpoint gaps
+        step = policy_step(self.validate)
+        if step:
+            pairs = validate_vec(sample(G, step), bU, self.pm, self.pp, self.fs, self.dA, self.fU)
+            self.validation = deviation_stats(*pairs)
+
+        B, phi, ent_pup_pos = viewpoint_vec(G, bU, self.pm, self.pp, self.fs, self.dA, self.fU, self.HH)
+
+        return Viewpoints(G, B, phi, ent_pup_pos)
+
+    def viewpoint_pairs(self, G1=None, G2=None, subpixel=1):
+        ''' This method computes the baseline :math:`B_{G_2}-B_{G_1}` and relative tilt angle
+        :math:`\\Phi_{G_2}-\\Phi_{G_1}` between the virtual cameras of all viewpoint gap pairs, which is possible
+        as virtual cameras of all viewpoints share the same entrance pupil position in the paraxial model.
+
+        :param G1: viewpoint gaps of first view (all within micro image if None)
+        :param G2: viewpoint gaps of second view (same as G1 if None)
+        :param subpixel: number of viewpoint gaps per pixel if G1 is None
+        :type G1: :class:`~numpy:numpy.ndarray`
+        :type G2: :class:`~numpy:numpy.ndarray`
+        :type subpixel: int
+
+        :return: **G1**, **G2**, **B**, **phi** of shape (len(G1), len(G2))
+        :rtype: :class:`ViewpointPairs` of :class:`~numpy:numpy.ndarray`
+
+        '''
+
+        G1 = self.viewpoint_gaps(subpixel) if G1 is None else np.atleast_1d(np.asarray(G1, dtype=float))
+        G2 = G1 if G2 is None else np.atleast_1d(np.asarray(G2, dtype=float))
+
+        # viewpoints are computed once per distinct gap
+        G, idx = np.unique(np.concatenate([G1, G2]), return_inverse=True)
+        views = self.viewpoints(G)
+        idx1, idx2 = idx[:G1.size, None], idx[None, G1.size:]
+
+        G1, G2 = np.broadcast_arrays(G1[:, None], G2[None, :])
+
+        return ViewpointPairs(G1, G2, views.B[idx2]-views.B[idx1], views.phi[idx2]-views.phi[idx1])
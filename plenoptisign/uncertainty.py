@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+__author__ = "Christopher Hahne"
+__email__ = "inbox@christopherhahne.de"
+__license__ = """
+Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import numpy as np
+
+from .records import CameraParams, RefoResult, TriaResult
+from .solver import solve_img_dist
+from .refo import refo_ana_vec
+from .tria import triangulate
+from .constants import PlenoptisignError
+
+# input parameters with tolerances whose partial derivatives are carried along
+KEYS = ('pp', 'fs', 'pm', 'dA', 'fU', 'HH', 'df', 'M', 'G')
+
+
+def tria_sigma(G, dx, sigma, data=None):
+    """
+
+    This function propagates disparity noise and input parameter tolerances to standard deviations of the baseline
+    :math:`B_G`, tilt angle :math:`\\Phi_G` and triangulation distance :math:`Z_{(G, \\Delta x)}` of :func:`tria()`
+    to first order, i.e. :math:`\\sigma_Z^2 = \\sum_k (\\partial Z/\\partial x_k)^2 \\sigma_{x_k}^2` for independent
+    inputs :math:`x_k`. Partial derivatives of the per-camera constants with respect to all parameters are computed
+    once per viewpoint gap from the paraxial closed-form viewpoint while those with respect to disparities are
+    evaluated analytically per element.
+
+    :param G: viewpoint gaps
+    :param dx: disparity values
+    :param sigma: standard deviations of disparities ('dx') and parameters in :data:`KEYS`, e.g. {'dx': .1, 'fU': .5}
+    :param data: dictionary of input parameters or :class:`CameraParams` (see :class:`MainClass`)
+    :type G: :class:`~numpy:numpy.ndarray`
+    :type dx: :class:`~numpy:numpy.ndarray`
+    :type sigma: dict
+    :type data: dict
+
+    :return: **B**, **phi**, **Z** standard deviations of broadcast shape of G and dx (NaN where Z is not finite)
+    :rtype: :class:`TriaResult` of :class:`~numpy:numpy.ndarray`
+
+    """
+
+    _check(sigma, KEYS + ('dx',))
+
+    p = CameraParams.coerce(data)
+    G, dx = np.asarray(G, dtype=float), np.asarray(dx, dtype=float)
+    shape = np.broadcast(G, dx).shape
+    bU, dbU = _img_dist_jac(p, len(shape))
+
+    # per camera constants and their derivatives
+    B, T, P, dB, dT, dP = _viewpoint_jac(p, G, bU, dbU, len(shape))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        # derivatives of Z = B*bU/(dx*P - bU*T) per element
+        den = dx*P - bU*T
+        Z_dx = -B*bU*P/den**2
+        dZ = bU/den*dB + (B/den + B*bU*T/den**2)*dbU - B*bU*dx/den**2*dP + B*bU**2/den**2*dT
+
+        # tilt angle phi = arctan(T) in degrees
+        dphi = np.degrees(dT/(1+T**2))
+
+        sig_Z = np.sqrt(_var(dZ, sigma) + (Z_dx*sigma.get('dx', 0))**2)
+
+    # depth planes at and beyond infinity
+    Z = triangulate(dx, B, np.degrees(np.arctan(T)), P, bU, p.fU)
+    sig_Z = np.where(np.isfinite(Z), sig_Z, float('nan'))
+
+    return TriaResult(*[np.broadcast_to(val, shape) for val in (np.sqrt(_var(dB, sigma)),
+                                                                np.sqrt(_var(dphi, sigma)), sig_Z)])
+
+
+def refo_sigma(a, sigma, data=None):
+    """
+
+    This function propagates shift parameter noise and input parameter tolerances to standard deviations of the
+    refocusing distance :math:`d_a`, depth of field borders :math:`d_{a\\pm }` and depth of field of :func:`refo()`
+    to first order for independent inputs. Derivatives follow analytically from the closed-form image distances
+    :math:`b_{U,\\sigma}` of :func:`refo_ana_vec()` mapped by the thin lens equation where the derivatives of the main
+    lens image distance :math:`b_U` are computed once per camera. Depth of field deviations account for the
+    correlation of both borders.
+
+    :param a: refocusing shift parameters
+    :param sigma: standard deviations of shift parameters ('a') and parameters in :data:`KEYS`, e.g. {'df': 10}
+    :param data: dictionary of input parameters or :class:`CameraParams` (see :class:`MainClass`)
+    :type a: :class:`~numpy:numpy.ndarray`
+    :type sigma: dict
+    :type data: dict
+
+    :return: **d**, **d_p**, **d_m**, **dof** standard deviations of shape of a (NaN where distances are infinite)
+    :rtype: :class:`RefoResult` of :class:`~numpy:numpy.ndarray`
+
+    """
+
+    _check(sigma, KEYS + ('a',))
+
+    p = CameraParams.coerce(data)
+    a = np.asarray(a, dtype=float)
+    bU, dbU = _img_dist_jac(p, a.ndim)
+
+    # micro image shift spanned by both chief rays
+    K = p.pm*p.fs/p.pp
+    dK = K*(_unit('pm', a.ndim)/p.pm + _unit('fs', a.ndim)/p.fs - _unit('pp', a.ndim)/p.pp)
+    T = a*(p.M-1)
+    dT = a*_unit('M', a.ndim)
+
+    res = refo_ana_vec(a, bU, p.M, p.pm, p.pp, p.fs, p.dA, p.fU, p.HH)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        grads = []
+        for sign in (0, -1, 1):
+            # image distance b = bU + N/Dn behind the main lens
+            N = K*(T+sign)
+            Dn = p.M-1-sign - T*K/p.dA
+            dN = dK*(T+sign) + K*dT
+            dDn = _unit('M', a.ndim) - (dT*K + T*dK)/p.dA + T*K/p.dA**2*_unit('dA', a.ndim)
+            db = dbU + (dN*Dn - N*dDn)/Dn**2
+            b_a = (K*Dn + N*K/p.dA)*(p.M-1)/Dn**2
+            b = bU + N/Dn
+
+            # object distance d = b*fU/(b-fU) + bU + HH
+            g_b = -p.fU**2/(b-p.fU)**2
+            dd = g_b*db + b**2/(b-p.fU)**2*_unit('fU', a.ndim) + dbU + _unit('HH', a.ndim)
+            grads.append((dd, g_b*b_a))
+
+        # depth of field from correlated borders
+        grads.append(tuple(x-y for x, y in zip(grads[1], grads[2])))
+
+        sigs = [np.sqrt(_var(dd, sigma) + (d_a*sigma.get('a', 0))**2) for dd, d_a in grads]
+
+    return RefoResult(*[np.where(np.isfinite(val), sig, float('nan')) for val, sig in zip(res, sigs)])
+
+
+def _check(sigma, keys):
+    ''' raise error for standard deviations of unknown inputs '''
+
+    for key in sigma:
+        if key not in keys:
+            raise PlenoptisignError('No uncertainty propagation for parameter %s' % key)
+
+
+def _unit(key, ndim=0):
+    ''' derivative of an input parameter with respect to all parameters along the first axis '''
+
+    arr = np.zeros((len(KEYS),)+(1,)*ndim)
+    arr[KEYS.index(key)] = 1
+
+    return arr
+
+
+def _var(grad, sigma):
+    ''' variance from derivatives along the first axis and standard deviations of parameters '''
+
+    sig = np.array([sigma.get(key, 0) for key in KEYS], dtype=float).reshape((len(KEYS),)+(1,)*(np.ndim(grad)-1))
+
+    return np.sum((grad*sig)**2, axis=0)
+
+
+def _img_dist_jac(p, ndim=0):
+    ''' main lens image distance and its derivatives by implicit differentiation of the thin lens equation '''
+
+    bU = float(solve_img_dist(p.df, p.fU, p.HH)[0])
+    aU = p.df-bU-p.HH
+
+    # 1/bU + 1/aU - 1/fU = 0 with vanishing terms for objects at infinity
+    inv = 1/aU**2
+    F_bU = inv - 1/bU**2
+    dbU = -(inv*(_unit('HH', ndim) - _unit('df', ndim)) + _unit('fU', ndim)/p.fU**2)/F_bU
+
+    return bU, dbU
+
+
+def _viewpoint_jac(p, G, bU, dbU, ndim=0):
+    ''' paraxial baseline B, tilt T = tan(phi) and projected pixel pitch P of viewpoint G and their derivatives '''
+
+    # image side slope of viewpoint ray through micro lens on optical axis
+    m0 = -p.pp*G/p.fs
+    dm0 = -G/p.fs*_unit('pp', ndim) + p.pp*G/p.fs**2*_unit('fs', ndim) - p.pp/p.fs*_unit('G', ndim)
+
+    # object side slope factor and inverse exit pupil distance
+    k = 1-bU/p.fU
+    dk = -dbU/p.fU + bU/p.fU**2*_unit('fU', ndim)
+    e = 1/p.dA
+    de = -_unit('dA', ndim)/p.dA**2
+
+    # entrance pupil intersection z common to all viewpoints
+    w = k*e + 1/p.fU
+    dw = e*dk + k*de - _unit('fU', ndim)/p.fU**2
+    z = (1-bU*e)/w
+    dz = (-(e*dbU + bU*de) - z*dw)/w
+
+    B = m0*(k*z + bU)
+    dB = dm0*(k*z + bU) + m0*(dk*z + k*dz + dbU)
+    T = m0*k
+    dT = dm0*k + m0*dk
+    P = bU*p.pm*w
+    dP = p.pm*w*dbU + bU*w*_unit('pm', ndim) + bU*p.pm*dw
+
+    return B, T, P, dB, dT, dP
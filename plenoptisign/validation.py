@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+__author__ = "Christopher Hahne"
+__email__ = "inbox@christopherhahne.de"
+__license__ = """
+Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import numpy as np
+
+from .records import ValidationStats
+from .constants import PlenoptisignError
+
+def policy_step(policy):
+    """
+
+    This function converts a validation policy to the step between validated evaluations, i.e. every evaluation is
+    validated for 'always', every N-th for 'sampled:N' and none for 'never' which is denoted by a step of zero.
+
+    :param policy: 'always', 'sampled:N' or 'never'
+    :type policy: str
+
+    :return: **step**
+    :rtype: int
+
+    """
+
+    name, _, num = str(policy).partition(':')
+
+    if name == 'always' and not num:
+        return 1
+    elif name == 'never' and not num:
+        return 0
+    elif name == 'sampled' and num.isdigit() and int(num) > 0:
+        return int(num)
+
+    raise PlenoptisignError('Unknown validation policy %s' % policy)
+
+
+def sample(arr, step):
+    """ every step-th element of a flattened array """
+
+    return np.ravel(arr)[::step]
+
+
+def deviation_stats(*pairs):
+    """
+
+    This function aggregates absolute deviations of value pairs of equal shape. Pairs being infinite with the same sign
+    do not deviate whereas NaN pairs are ignored.
+
+    :param pairs: tuples of reference and alternative values
+    :type pairs: tuple of :class:`~numpy:numpy.ndarray`
+
+    :return: **count**, **max_dev**, **mean_dev**
+    :rtype: :class:`ValidationStats`
+
+    """
+
+    with np.errstate(invalid='ignore'):
+        dev = np.concatenate([np.ravel(np.where(x == y, 0, np.abs(np.subtract(x, y)))) for x, y in pairs])
+    dev = dev[~np.isnan(dev)]
+
+    if dev.size == 0:
+        return ValidationStats(0, 0., 0.)
+
+    return ValidationStats(dev.size, float(dev.max()), float(dev.mean()))
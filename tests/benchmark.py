@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+__author__ = "Christopher Hahne"
+__email__ = "inbox@christopherhahne.de"
+__license__ = """
+Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import timeit
+import itertools
+import numpy as np
+
+from plenoptisign.mainclass import MainClass
+from plenoptisign.records import CameraParams
+from plenoptisign import core
+from plenoptisign.refo import refo_vec
+from plenoptisign.tria import tria_vec
+from plenoptisign.solver import solve_img_dist
+
+
+def latency(func, number=2000, repeat=5):
+    ''' best per call latency in microseconds '''
+
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    ''' print latency per call, run from repository root via: python -m tests.benchmark '''
+
+    params = CameraParams.from_dict({'df': 2000})
+    object = MainClass(params, cache_size=0, validate='never')
+
+    # single evaluations of vectorized engine, scalar engine and main class (uncached)
+    p = params
+    bU = solve_img_dist(p.df, p.fU, p.HH)[0]
+    cases = [
+        ('refo', lambda: refo_vec(p.a, bU, p.M, p.pm, p.pp, p.fs, p.dA, p.fU, p.HH), lambda: core.refo_scalar(p)),
+        ('tria', lambda: tria_vec(p.G, p.dx, bU, p.pm, p.pp, p.fs, p.dA, p.fU, p.HH), lambda: core.tria_scalar(p)),
+    ]
+
+    print('%-6s %12s %12s %8s %14s' % ('method', 'vec [us]', 'scalar [us]', 'speedup', 'MainClass [us]'))
+    for name, vec_func, scalar_func in cases:
+        t_vec, t_scalar = latency(vec_func), latency(scalar_func)
+        t_main = latency(getattr(object, name))
+        print('%-6s %12.2f %12.2f %7.1fx %14.2f' % (name, t_vec, t_scalar, t_vec/t_scalar, t_main))
+
+    # ray tracing and closed-form refocusing for single evaluations and batches
+    a = np.linspace(0, 6, 10**5)
+    t_ray, t_ana = latency(lambda: core.refo_scalar(params)), latency(lambda: core.refo_analytic(params))
+    print('\n%-6s %12s %12s %8s' % ('refo', 'ray [us]', 'ana [us]', 'speedup'))
+    print('%-6s %12.2f %12.2f %7.1fx' % ('single', t_ray, t_ana, t_ray/t_ana))
+    t_ray = latency(lambda: object.refo_batch(a), number=5)
+    t_ana = latency(lambda: object.refo_batch(a, method='analytic'), number=5)
+    print('%-6s %12.2f %12.2f %7.1fx' % ('batch', t_ray/a.size, t_ana/a.size, t_ray/t_ana))
+
+    # validation policies for single evaluations and batches
+    print('\n%-12s %12s %12s' % ('validate', 'refo [us]', 'batch [us]'))
+    for policy in ('always', 'sampled:100', 'never'):
+        object.validate = policy
+        t_single = latency(object.refo)
+        t_batch = latency(lambda: object.refo_batch(a), number=5)
+        print('%-12s %12.2f %12.2f' % (policy, t_single, t_batch/a.size))
+
+    # selective outputs for single evaluations and batches
+    object.validate = 'never'
+    print('\n%-12s %12s %12s' % ('outputs', 'refo [us]', 'batch [us]'))
+    for outputs in (None, ('d', 'dof'), ('d',)):
+        t_single = latency(lambda: core.refo_scalar(params, outputs=outputs))
+        t_batch = latency(lambda: object.refo_batch(a, outputs=outputs), number=5)
+        print('%-12s %12.2f %12.2f' % (','.join(outputs or ['all']), t_single, t_batch/a.size))
+
+    # single parameter edits of main class recomputing downstream stages only
+    print('\n%-12s %12s %12s %12s %12s' % ('edit', 'refo [us]', 'tria [us]', 'full refo', 'full tria'))
+    for key in ('dx', 'a', 'G', 'df'):
+        vals = itertools.cycle([getattr(object, key)+1e-3, getattr(object, key)])
+
+        def edit(name, full=False, key=key, vals=vals):
+            setattr(object, key, next(vals))
+            if full:
+                object._graph.clear()
+            return getattr(object, name)()
+        print('%-12s %12.2f %12.2f %12.2f %12.2f' % (key, latency(lambda: edit('refo')), latency(lambda: edit('tria')),
+                                                     latency(lambda: edit('refo', True)),
+                                                     latency(lambda: edit('tria', True))))
+
+
+if __name__ == '__main__':
+    main()
@@ -21,9 +21,19 @@ Copyright (c) 2019 Christopher Hahne <inbox@christopherhahne.de>
 """
 
 import unittest
+import os
+import tempfile
+import numpy as np
 from ddt import ddt, data, unpack
 from plenoptisign.mainclass import MainClass
-from plenoptisign.constants import ABBS, DEC_P
+from plenoptisign.solver import solve_img_dist, solve_sle, solve_sle_2x2
+from plenoptisign.constants import ABBS, RABB, DEC_P, PlenoptisignError, Flag
+from plenoptisign import sweep, depthmap, core, refo, validation, bundle, uncertainty, montecarlo
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from plenoptisign.lut import DepthLUT
+from plenoptisign.tria import tria_vec
+from plenoptisign.records import CameraParams, RefoResult, TriaResult, RayBundle, to_array, from_array
 
 @ddt
 class PlenoptiSignTester(unittest.TestCase):
@@ -65,6 +75,655 @@ class PlenoptiSignTester(unittest.TestCase):
         # assertion
         self.assertEqual(data_out, data_exp)
 
+    @data(
+        ([(0, 0), .009, 2.75, .396, .125, 111.0324, 193.2935, -65.5563, 'inf', 2.6846, 1, 13, -6, 1], (-4, 8, 49)),
+        ([(0, 0), .009, 2.75, .396, .125, 111.0324, 193.2935, -65.5563, 2000, 2.6846, 1, 13.9523, -6, 1], (-4, 8, 49)),
+        )
+    @unpack
+    def test_refo_batch(self, vals, a_range):
+        # zip to dict
+        data_in = dict(zip(ABBS, vals))
+        # batch refocusing estimation
+        a_arr = np.linspace(*a_range)
+        data_out = np.round(MainClass(data_in).refo_batch(a_arr), DEC_P)
+        # scalar refocusing estimation as reference
+        for k, a in enumerate(a_arr):
+            object = MainClass(dict(data_in, a=a))
+            object.refo()
+            data_exp = np.round([object.d, object.d_p, object.d_m, object.dof], DEC_P)
+            # assertion
+            self.assertTrue(np.array_equal(data_out[:, k], data_exp))
+
+    @data(
+        ([(0, 0), .009, 2.75, .396, .125, 111.0324, 193.2935, -65.5563, 'inf', 2.6846, 0, 13, -6, 1], (-6, 7), (-2, 2, 9)),
+        ([(0, 0), .009, 2.75, .396, .125, 111.0324, 193.2935, -65.5563, 2000, 2.6846, 0, 13, -6, 1], (1, 7), (-2, 2, 9)),
+        )
+    @unpack
+    def test_tria_batch(self, vals, G_range, dx_range):
+        # zip to dict
+        data_in = dict(zip(ABBS, vals))
+        # batch triangulation estimation from broadcast arrays
+        G_arr, dx_arr = np.arange(*G_range)[:, None], np.linspace(*dx_range)[None, :]
+        object = MainClass(data_in)
+        data_out = np.round(object.tria_batch(G_arr, dx_arr), DEC_P)
+        # assertion of shape and untouched ray state
+        self.assertEqual(data_out.shape, (3, G_arr.size, dx_arr.size))
+        self.assertFalse(object._u.any() or object._mij.any() or object._Uij.any() or object._qij.any())
+        # scalar triangulation estimation as reference
+        for i, G in enumerate(G_arr[:, 0]):
+            for k, dx in enumerate(dx_arr[0, :]):
+                object = MainClass(dict(data_in, G=G, dx=dx))
+                object.tria()
+                data_exp = np.round([object.B, object.phi, object.Z], DEC_P)
+                # assertion
+                self.assertTrue(np.array_equal(data_out[:, i, k], data_exp))
+
+    @data(
+        (float('inf'), 193.2935, -65.5563, 193.2935, False),
+        (2000, 193.2935, -65.5563, 215.8497, False),
+        (800, 193.2935, -65.5563, 291.3903, False),
+        (500, 193.2935, -65.5563, 282.7781, True),
+        (100, 193.2935, -65.5563, float('inf'), False),
+        )
+    @unpack
+    def test_img_dist(self, df, fU, HH, bU_exp, mask_exp):
+        # scalar closed-form image distance
+        bU, mask = solve_img_dist(df, fU, HH)
+        # assertion
+        self.assertEqual(round(float(bU), DEC_P), bU_exp)
+        self.assertEqual(bool(mask), mask_exp)
+        # array input yields same result element-wise
+        bU_arr, mask_arr = solve_img_dist(np.repeat(df, 3), fU, HH)
+        self.assertTrue(np.all(bU_arr == bU) and np.all(mask_arr == mask))
+
+    def test_solve_sle_2x2(self):
+        # random stack of systems including a singular (parallel ray) one
+        rng = np.random.default_rng(0)
+        A, b = rng.normal(size=(100, 2, 2)), rng.normal(size=(100, 2))
+        A[7] = [[-.5, 1], [-.5, 1]]
+        x, mask = solve_sle_2x2(A, b)
+        # assertion
+        self.assertEqual(x.shape, (100, 2))
+        self.assertTrue(mask[7] and mask.sum() == 1 and np.all(np.isnan(x[7])))
+        self.assertTrue(np.allclose(x[~mask], np.linalg.solve(A[~mask], b[~mask][..., None])[..., 0]))
+        # single system behaves as before
+        self.assertTrue(np.allclose(solve_sle(A[0], b[0]), np.linalg.solve(A[0], b[0])))
+        self.assertRaises(np.linalg.LinAlgError, solve_sle, A[7], b[7])
+        # non-square systems use pseudo-inverse
+        self.assertTrue(np.allclose(solve_sle(A[0, :1], b[0, :1]), np.linalg.pinv(A[0, :1]).dot(b[0, :1])))
+
+    @data(
+        ({'a': [0, 1, 2.5], 'fU': [150, 193.2935], 'df': [2000, 'inf'], 'dx': [-1, .5, 1]}, 5),
+        ({'G': [-6, -3, 2], 'pm': [.1, .125], 'f_num': [2.5, 4]}, 4),
+        ({'fs': [2.5, 2.75, 3]}, 2),
+        ({'pm': [.1, .125]}, 1),
+        ({'pp': [.008, .009], 'dA': [100, 111.0324]}, 3),
+        )
+    @unpack
+    def test_sweep(self, grid, chunk_size):
+        # chunked sweep over Cartesian product
+        res = sweep.run(grid, chunk_size=chunk_size)
+        # assertion of labelled grid shape
+        self.assertEqual(res.shape, tuple(len(grid[key]) for key in grid))
+        self.assertEqual(list(res.values.dtype.names), RABB + ['flags'])
+        # scalar estimation as reference
+        for idx in np.ndindex(res.shape):
+            data_in = dict((key, grid[key][i]) for key, i in zip(grid, idx))
+            object = MainClass(data_in)
+            if 'f_num' in grid:
+                object.compute_mic_img_size()
+            object.refo()
+            msg_exp = object.console_msg
+            object.tria()
+            data_exp = np.round(object.get_results(), DEC_P)
+            # assertion
+            data_out = np.round(list(res.values[RABB][idx]), DEC_P)
+            self.assertTrue(np.array_equal(data_out, data_exp, equal_nan=True))
+            self.assertEqual(Flag(int(res['flags'][idx])).render(object.a), msg_exp)
+
+    def test_sweep_workers(self):
+        # parallel sweep writing to shared memory
+        grid = {'a': np.linspace(0, 3, 7), 'df': [1000, 2000, 'inf'], 'G': [-6, 3], 'dx': np.linspace(-1, 1, 5)}
+        res_exp = sweep.run(grid)
+        with sweep.run(grid, chunk_size=16, workers=2) as res:
+            # results are read from shared memory without copy
+            name = res._shm.name
+            self.assertTrue(np.shares_memory(res.values, np.ndarray(res.shape, res.values.dtype, res._shm.buf)))
+            for key in RABB + ['flags']:
+                self.assertTrue(np.array_equal(res[key], res_exp[key], equal_nan=True))
+            d = res['d']
+        # shared memory is unlinked on exit while arrays taken before stay valid
+        self.assertIsNone(res.values)
+        self.assertRaises(FileNotFoundError, shared_memory.SharedMemory, name=name)
+        self.assertTrue(np.array_equal(d, res_exp['d'], equal_nan=True))
+
+    @data(
+        ([(0, 0), .009, 2.75, .396, .125, 111.0324, 193.2935, -65.5563, 'inf', 2.6846, 1, 13, -6, 1],
+         [500, 962.7459, 1500, 5000, float('inf'), 300, 127.7372], [0, 0, 0, 0, 8, 16, 16]),
+        ([(0, 0), .009, 2.75, .396, .125, 111.0324, 193.2935, -65.5563, 2000, 2.6846, 1, 13, -6, 1],
+         [500, 962.7459, 1500, 5000, float('inf'), 100], [0, 0, 0, 0, 8, 16]),
+        ([(0, 0), .009, 2.75, .396, .125, 111.0324, 193.2935, -65.5563, 'inf', 2.6846, 1, 2, -6, 1],
+         [500, 400, float('inf')], [0, 4, 8]),
+        )
+    @unpack
+    def test_solve_a_for_distance(self, vals, d_target, flags_exp):
+        # zip to dict
+        object = MainClass(dict(zip(ABBS, vals)))
+        # inverse refocusing
+        a, flags = object.solve_a_for_distance(d_target)
+        # assertion
+        self.assertEqual(list(flags), flags_exp)
+        self.assertTrue(np.array_equal(np.isnan(a), flags == Flag.PLANE_RANGE))
+        mask = flags & (Flag.PLANE_RANGE | Flag.SLICE_RANGE) > 0
+        data_out = np.round(object.refo_batch(a[~mask])[0], DEC_P)
+        self.assertTrue(np.allclose(data_out, np.array(d_target)[~mask]))
+
+    @data(
+        ([(0, 0), .009, 2.75, .396, .125, 111.0324, 193.2935, -65.5563, 'inf', 2.6846, 0, 13, -6, 1],
+         [-6, -4, -1.5], [500, 1000, 5869.2898, 10**5]),
+        ([(0, 0), .009, 2.75, .396, .125, 111.0324, 193.2935, -65.5563, 2000, 2.6846, 0, 13, -6, 1],
+         [-6, 1, 6], [500, 1000, 5869.2898, 10**5]),
+        )
+    @unpack
+    def test_solve_dx_for_depth(self, vals, G, Z):
+        # zip to dict
+        object = MainClass(dict(zip(ABBS, vals)))
+        # inverse triangulation
+        dx = object.solve_dx_for_depth(Z, G)
+        # assertion
+        self.assertEqual(dx.shape, (len(G), len(Z)))
+        data_out = np.round(object.tria_batch(np.array(G)[:, None], dx)[2], DEC_P)
+        self.assertTrue(np.allclose(data_out, np.broadcast_to(Z, dx.shape)))
+
+    def test_disparity_to_depth(self):
+        # synthetic disparity map
+        disp = np.random.default_rng(0).uniform(-2, 2, size=(65, 40)).astype('float32')
+        data_exp = MainClass().tria_batch(-6, disp)[2]
+        # in-memory conversion
+        data_out = depthmap.disparity_to_depth(disp, -6, tile=16)
+        self.assertTrue(np.allclose(data_out, data_exp, equal_nan=True))
+        # memory-mapped conversion
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            np.save(os.path.join(tmp_dir, 'disp.npy'), disp)
+            depthmap.disparity_to_depth(os.path.join(tmp_dir, 'disp.npy'), -6, out=os.path.join(tmp_dir, 'z.npy'), tile=7)
+            data_out = np.load(os.path.join(tmp_dir, 'z.npy'))
+        self.assertTrue(np.allclose(data_out, data_exp, equal_nan=True))
+
+    @data(
+        ([(0, 0), .009, 2.75, .396, .125, 111.0324, 193.2935, -65.5563, 'inf', 2.6846, 1, 13, -6, 1],),
+        ([(0, 0), .009, 2.75, .396, .125, 111.0324, 193.2935, -65.5563, 2000, 2.6846, 1, 13, -6, 1],),
+        )
+    @unpack
+    def test_depth_lut(self, vals):
+        # build and restore look-up table
+        object = MainClass(dict(zip(ABBS, vals)))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            DepthLUT.build(object, G=[-6, -3]).save(os.path.join(tmp_dir, 'lut.npz'))
+            lut = DepthLUT.load(os.path.join(tmp_dir, 'lut.npz'))
+        # assertion of queries within estimated errors
+        dx = np.linspace(-3, 3, 101)
+        data_out, data_exp = lut.depth(dx, -3), object.tria_batch(-3, dx)[2]
+        self.assertLess(lut.error_estimate['Z'], 1e-12)
+        self.assertTrue(np.allclose(1/data_out, 1/data_exp, rtol=0, atol=1e-12, equal_nan=True))
+        a = np.linspace(lut.a[0], lut.a[-1], 101)
+        for key, data_out, data_exp in zip(('d', 'd_p', 'd_m'), lut.refo(a), object.refo_batch(a)):
+            self.assertLess(lut.error_estimate[key], 1e-6)
+            self.assertTrue(np.allclose(1/data_out, 1/data_exp, rtol=0, atol=lut.error_estimate[key]))
+        self.assertRaises(PlenoptisignError, lut.depth, dx, 1)
+
+    def test_cache(self):
+        # reference evaluation without cache
+        object_exp = MainClass(cache_size=0)
+        object_exp.refo()
+        object_exp.tria()
+        # repeated evaluations
+        object = MainClass()
+        for _ in range(3):
+            object.refo()
+            object.tria()
+        self.assertEqual(object.cache_info(), (4, 2, 32, 2))
+        # change of disparity only affects triangulation
+        object.a, object.dx = 3, 2
+        object.refo()
+        object.tria()
+        self.assertEqual(object.cache_info(), (4, 4, 32, 4))
+        # stored results and ray state are restored
+        object.a, object.dx = object_exp.a, object_exp.dx
+        object.refo()
+        object.tria()
+        self.assertEqual(object.cache_info()[:2], (6, 4))
+        self.assertEqual(object.get_results(), object_exp.get_results())
+        for name in ('_u', '_s', '_Uij', '_qij', '_UijU', '_UijL'):
+            self.assertTrue(np.array_equal(getattr(object, name), getattr(object_exp, name)))
+        # invalidation
+        object.cache_clear()
+        self.assertEqual(object.cache_info(), (0, 0, 32, 0))
+
+    @data(
+        ([(0, 0), .009, 2.75, .396, .125, 111.0324, 193.2935, -65.5563, 'inf', 2.6846, 1, 13, -6, 1],),
+        )
+    @unpack
+    def test_records(self, vals):
+        # immutable and hashable parameter record
+        params = CameraParams.from_dict(dict(zip(ABBS, vals)))
+        self.assertRaises(AttributeError, setattr, params, 'a', 2)
+        self.assertFalse(hasattr(params, '__dict__'))
+        self.assertEqual(len({params, CameraParams.from_dict(dict(zip(ABBS, vals)))}), 1)
+        # record and dictionary input are equivalent
+        object, object_exp = MainClass(params), MainClass(dict(zip(ABBS, vals)))
+        for obj in (object, object_exp):
+            obj.refo()
+            obj.tria()
+        self.assertEqual(object.params, params)
+        self.assertIs(CameraParams.coerce(params), params)
+        self.assertEqual((object.refo_opt, object.tria_opt), (True, True))
+        self.assertEqual(object.get_results(), object_exp.get_results())
+        self.assertEqual(object.refo_result + object.tria_result, tuple(object_exp.get_results()))
+        # structured arrays carry records in batches
+        for records in ([params, params._replace(a=2.)], [object.refo_result], [object.tria_result]):
+            self.assertEqual(from_array(to_array(records)), records)
+
+    def test_core_threads(self):
+        # one shared read-only camera model
+        params = CameraParams.from_dict({'df': 2000})
+        a_arr = np.linspace(0, 2.5, 64)
+        # reference from stateful main class
+        data_exp = []
+        for a in a_arr:
+            object = MainClass(params._replace(a=a))
+            object.refo()
+            object.tria()
+            data_exp.append(object.get_results())
+        # concurrent evaluation of pure functions
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            data_out = list(executor.map(lambda a: core.refo(params._replace(a=a)).result + core.tria(params).result,
+                                         a_arr))
+        # assertion
+        self.assertEqual([list(res) for res in data_out], data_exp)
+        self.assertIsInstance(core.refo(params).u, tuple)
+
+    @data(np.int64, np.float32, np.float64)
+    def test_numpy_scalars(self, cast):
+        # repeated evaluations with numpy scalars of shift parameter and disparity
+        object, object_exp = MainClass({'df': 2000}), MainClass({'df': 2000})
+        object.refo()
+        object.tria()
+        self.assertTrue(core.is_scalar(object.params._replace(a=cast(1))))
+        for val in np.arange(4):
+            object.a, object.dx = cast(val), cast(val)
+            object_exp.a, object_exp.dx = float(val), float(val)
+            for obj in (object, object_exp):
+                obj.refo()
+                obj.tria()
+            self.assertTrue(np.allclose(object.get_results(), object_exp.get_results(), equal_nan=True))
+
+    @data(
+        (1, float('inf'), -6, 1),
+        (0, 1500, 2, 0),
+        (2.5, 300, 5.5, -3),
+        (.5, 800, -1, 2.7),
+        (13, 5000, 0, 1),
+    )
+    @unpack
+    def test_scalar_engine(self, a, df, G, dx):
+        # camera model with plain numbers
+        params = CameraParams.from_dict({'a': a, 'df': df, 'G': G, 'dx': dx})
+        self.assertTrue(core.is_scalar(params))
+        self.assertFalse(core.is_scalar(params._replace(a=np.array(a))))
+        # compare allocation-free engine with vectorized engine
+        p = params
+        bU, mask = solve_img_dist(p.df, p.fU, p.HH)
+        ref = refo.refo_vec(p.a, bU, p.M, p.pm, p.pp, p.fs, p.dA, p.fU, p.HH) + \
+            tria_vec(p.G, p.dx, bU, p.pm, p.pp, p.fs, p.dA, p.fU, p.HH)
+        state = core.refo_scalar(params, validate=False)
+        np.testing.assert_allclose(state.result + core.tria_scalar(params).result, ref, rtol=1e-9, atol=1e-9)
+        self.assertEqual(state.flags, refo.refo_flags_vec(p.a, bU, p.M, p.pm, p.pp, p.fs, p.dA, p.fU, mask))
+        self.assertIsInstance(state.u, tuple)
+
+    def test_refo_analytic(self):
+        # broad corpus of random camera models
+        rng = np.random.RandomState(15)
+        for _ in range(200):
+            pp, fs, pm, dA, fU, HH = [rng.uniform(*lims) for lims in ((.002, .02), (.5, 5), (.05, .3), (50, 200),
+                                                                         (20, 300), (-100, 100))]
+            df = float('inf') if rng.rand() < .2 else fU*rng.uniform(1.5, 50)+HH
+            M = rng.uniform(5, 30)
+            bU = solve_img_dist(df, fU, HH)[0]
+            a = np.linspace(-M/2, M/2, 101)
+            # cross-check closed-form expressions with ray tracing in reciprocal domain
+            ref = refo.refo_vec(a, bU, M, pm, pp, fs, dA, fU, HH)
+            val = refo.refo_ana_vec(a, bU, M, pm, pp, fs, dA, fU, HH)
+            for x, y in zip(ref[:3], val[:3]):
+                np.testing.assert_array_equal(np.isinf(x), np.isinf(y))
+                np.testing.assert_allclose(fU/y, fU/x, rtol=0, atol=1e-6)
+        # scalar record and main class
+        params = CameraParams.from_dict({'df': 2000, 'a': 2})
+        ref, val = core.refo_scalar(params), core.refo_analytic(params)
+        np.testing.assert_allclose(val.result, ref.result, rtol=1e-9)
+        self.assertEqual((val.flags, val.u), (ref.flags, None))
+        object = MainClass(params)
+        object.refo(method='analytic')
+        np.testing.assert_allclose(object.get_results()[:4], ref.result, rtol=1e-9)
+        self.assertRaises(PlenoptisignError, object.refo, method='exact')
+
+    @data(('always', 1), ('sampled:7', 7), ('never', 0))
+    @unpack
+    def test_validation(self, policy, step):
+        # policy conversion
+        self.assertEqual(validation.policy_step(policy), step)
+        for invalid in ('sampled:0', 'sampled', 'often', 'never:2'):
+            self.assertRaises(PlenoptisignError, validation.policy_step, invalid)
+            self.assertRaises(PlenoptisignError, MainClass, validate=invalid)
+        # camera model whose object and image side intersections disagree
+        object = MainClass({'a': -2, 'df': 150}, validate=policy)
+        for k, a in enumerate((-2, -1.5, -1)):
+            object.a = a
+            # every step-th evaluation is validated starting with the first
+            if step and k % step == 0:
+                self.assertRaises(PlenoptisignError, object.refo)
+            else:
+                self.assertTrue(object.refo())
+        # batches report aggregate deviations instead of raising
+        object = MainClass({'df': 2000}, validate=policy)
+        a = np.linspace(-2, 6, 70)
+        res = object.refo_batch(a)
+        bU = solve_img_dist(object.df, object.fU, object.HH)[0]
+        np.testing.assert_equal(res, refo.refo_vec(a, bU, object.M, object.pm, object.pp, object.fs, object.dA,
+                                                   object.fU, object.HH))
+        object.tria_batch(np.arange(-6, 7)[:, None], np.linspace(-2, 2, 5))
+        if step:
+            self.assertEqual(object.validation.count, len(range(0, 13, step)))
+            self.assertLess(object.validation.max_dev, 10**-DEC_P)
+            object.refo_batch(a)
+            self.assertEqual(object.validation.count, 3*len(range(0, 70, step)))
+            self.assertGreaterEqual(object.validation.max_dev, object.validation.mean_dev)
+        else:
+            self.assertIsNone(object.validation)
+
+    @data(500, 2000, 'inf')
+    def test_flags(self, df):
+        # batch flags per element
+        object = MainClass({'df': df})
+        a = np.array([-1, 0, 1, 7, 13.9523, 20])
+        res, flags = object.refo_batch(a, return_flags=True)
+        self.assertEqual(flags.dtype, np.uint16)
+        tria_flags = object.tria_batch(np.arange(-2, 3), 1, return_flags=True)[1]
+        self.assertEqual(tria_flags.shape, (5,))
+        # scalar reference
+        for k in range(len(a)):
+            object = MainClass({'df': df, 'a': a[k]}, validate='never')
+            object.refo(), object.tria()
+            self.assertEqual(flags[k], core.refo(object.params, validate=False).flags)
+            self.assertEqual(tria_flags[0], core.tria(object.params, validate=False).flags)
+            # lazily rendered console message
+            msg = Flag(tria_flags[0] or flags[k]).render(a[k])
+            self.assertEqual(object.console_msg, msg)
+            # message refers to evaluation while batches and parameter edits leave it untouched
+            bU, object.a = object.bU, a[k] + 1
+            object.refo_batch(a, return_flags=True), object.tria_batch(np.arange(-2, 3), 1), object.viewpoints()
+            object.solve_a_for_distance(1000), object.solve_dx_for_depth(np.array([1000.]), np.array([1.]))
+            self.assertEqual((object.console_msg, object.bU), (msg, bU))
+
+    @data(('d',), ('dof',), ('d_m', 'd'), ('B',), 'phi', ('Z', 'phi'))
+    def test_outputs(self, outputs):
+        # selective evaluation against full evaluation
+        params = CameraParams.from_dict({'df': 2000, 'a': 1.5})
+        a, G = np.linspace(-1, 6, 15), np.arange(-6, 7)
+        object = MainClass(params)
+        cls = RefoResult if 'phi' not in outputs and 'B' not in outputs and 'Z' not in outputs else TriaResult
+        if cls is RefoResult:
+            results = [(engine(params, outputs=outputs), engine(params)) for engine in
+                       (core.refo, core.refo_scalar, core.refo_analytic)]
+            results += [(object.refo_batch(a, method=method, outputs=outputs), object.refo_batch(a, method=method))
+                        for method in refo.REFO_METHODS]
+        else:
+            results = [(engine(params, outputs=outputs), engine(params)) for engine in (core.tria, core.tria_scalar)]
+            results.append((object.tria_batch(G, 1, outputs=outputs), object.tria_batch(G, 1)))
+        fields = (outputs,) if isinstance(outputs, str) else outputs
+        for part, full in results:
+            for key in cls._fields:
+                if key in fields:
+                    self.assertTrue(np.array_equal(getattr(part, key), getattr(full, key)))
+                else:
+                    self.assertIsNone(getattr(part, key))
+        # selective sweep
+        res = sweep.run({'a': a[:3], 'G': G[:2]}, data=params.to_dict(), outputs=outputs)
+        self.assertEqual(res.values.dtype.names, tuple(key for key in RABB if key in fields) + ('flags',))
+        # instance variables keep values of fields not requested
+        object.refo(), object.tria()
+        ref = [getattr(object, key) for key in RABB]
+        object.a, object.G = 2, 4
+        method = object.refo if cls is RefoResult else object.tria
+        method(outputs=outputs)
+        for key, val in zip(RABB, ref):
+            self.assertEqual(getattr(object, key) == val, key not in fields)
+        # invalid selections
+        for invalid in ((), ('d', 'x'), 'Z' if cls is RefoResult else 'd'):
+            self.assertRaises(PlenoptisignError, method, outputs=invalid)
+
+    @data(
+        ({'dx': 2}, ['tria']),
+        ({'G': 3}, ['tria_view', 'tria']),
+        ({'a': 2}, ['refo_rays', 'refo']),
+        ({'HH': -60}, ['img_dist', 'refo_rays', 'refo', 'tria_view', 'tria']),
+        ({'pp': .008}, ['refo_rays', 'refo', 'tria_view', 'tria']),
+        ({}, []),
+        )
+    @unpack
+    def test_graph(self, edit, nodes_exp):
+        # gui alike evaluation with unchanged parameters being set again
+        data_in = {'df': 2000, 'a': 1, 'G': -6, 'dx': 1}
+        object = MainClass(data_in, cache_size=0)
+        object.refo(), object.tria()
+        evals = dict(object._graph.evals)
+        # stored nodes are not counted as evaluations by the validation policy
+        n_eval = object._n_eval
+        object.refo(), object.tria()
+        self.assertEqual((object._n_eval, object._graph.evals), (n_eval, evals))
+        object.data = dict(data_in, **edit)
+        object.refo(), object.tria()
+        # only nodes downstream of edited parameter are recomputed
+        nodes = [name for name in object._graph.evals if object._graph.evals[name] > evals[name]]
+        self.assertEqual(sorted(nodes), sorted(nodes_exp))
+        # assertion against full evaluation
+        self.assertEqual(object.refo_result, core.refo_scalar(object.params).result)
+        self.assertEqual(object.tria_result, core.tria_scalar(object.params).result)
+        # attribute edits invalidate the same nodes and update the parameter snapshot
+        evals = dict(object._graph.evals)
+        for key in edit:
+            setattr(object, key, getattr(object, key)/2)
+        object.refo(), object.tria()
+        nodes = [name for name in object._graph.evals if object._graph.evals[name] > evals[name]]
+        self.assertEqual(sorted(nodes), sorted(nodes_exp))
+        vals = dict((key, object.fU/object.D if key == 'f_num' else getattr(object, key)) for key in ABBS)
+        self.assertEqual(object.params, CameraParams(**vals))
+        # micro image size follows pupil diameter
+        object.compute_mic_img_size()
+        self.assertAlmostEqual(object.M, object.D*object.fs/(object.fU*object.pp))
+        self.assertEqual(object._graph.evals['M'], 1)
+        object.D *= 2
+        object.compute_mic_img_size()
+        self.assertEqual((object._graph.evals['M'], object.params.f_num), (2, object.fU/object.D))
+
+    @data((0, 2**20), (1, 100), (None, 10**6))
+    @unpack
+    def test_ray_bundle(self, axis, chunk_size):
+        # chief rays of refocusing are part of the bundle
+        params = CameraParams.from_dict({'df': 2000, 'a': 2})
+        state = core.refo(params)
+        c, j = (params.M-1)/2, -np.round(params.a*(params.M-1)/2, DEC_P)
+        rays = bundle.ray_bundle(params, lenses=[j, params.a*(params.M-1)+j], pixels=[c, -c])
+        for key in ('s', 'u', 'Uij'):
+            self.assertTrue(np.array_equal(np.diag(getattr(rays, key)), getattr(state, key)))
+        # streamed chunks reassemble full sensor bundle
+        chunks = list(bundle.iter_ray_bundle(params, axis=axis, chunk_size=chunk_size))
+        self.assertEqual(chunks[-1][0].stop, int(params.sd[axis or 0] // params.pm))
+        for k in range(2) if axis is None else [axis]:
+            full = bundle.ray_bundle(params, axis=k)
+            self.assertEqual(full.qij.shape, (int(params.sd[k] // params.pm), round(params.M)))
+            for sl, chunk in chunks:
+                for key in RayBundle._fields:
+                    arr, exp = getattr(chunk, key), getattr(full, key)
+                    # components of both sensor dimensions
+                    if axis is None:
+                        arr, exp = arr[..., k], exp[sl, None, :, None] if k == 0 else exp[None, :, None, :]
+                    else:
+                        exp = exp[sl]
+                    self.assertTrue(np.all(arr == exp))
+                self.assertLessEqual(chunk.s.size // (2 if axis is None else 1), chunk_size)
+        self.assertRaises(PlenoptisignError, next, bundle.iter_ray_bundle(params, chunk_size=0))
+
+    @data((0, 'inf', 1), (1, 2000, 2), (None, 800, -.5))
+    @unpack
+    def test_refo_field(self, axis, df, a):
+        # refocusing across micro lenses of one or both sensor dimensions
+        params = CameraParams.from_dict({'df': df, 'a': a})
+        res = bundle.refo_field(params, axis=axis)
+        shape = tuple(int(params.sd[k] // params.pm) for k in ((0, 1) if axis is None else (axis,)))
+        self.assertEqual(res.d.shape, shape)
+        # paraxial refocusing planes are flat and match on-axis distances
+        ref = core.refo_scalar(params).result
+        for val, exp in zip(res, ref):
+            self.assertTrue(np.all(np.round(val, DEC_P) == round(exp, DEC_P)))
+        # on-axis offset is the plain vectorized computation
+        on_axis = refo.refo_vec(a, solve_img_dist(df, params.fU, params.HH)[0], params.M, params.pm, params.pp,
+                                params.fs, params.dA, params.fU, params.HH)
+        self.assertEqual(bundle.refo_field(params, axis=axis, outputs='d_p').d_p.shape, shape)
+        self.assertTrue(np.allclose(res.d, on_axis.d))
+
+    @data((13, 1), (13.9523, 1), (13.9523, 4), (7, 3))
+    @unpack
+    def test_viewpoints(self, M, subpixel):
+        # all viewpoint gaps within micro image including integers
+        object = MainClass({'df': 2000, 'M': M})
+        G = object.viewpoint_gaps(subpixel)
+        self.assertTrue(np.all(np.abs(G) <= (M-1)/2) and np.allclose(np.diff(G), 1/subpixel))
+        self.assertTrue(set(range(-int((M-1)//2), int((M-1)//2)+1)).issubset(G))
+        self.assertRaises(PlenoptisignError, object.viewpoint_gaps, .5)
+        # scalar triangulation as reference
+        views = object.viewpoints(subpixel=subpixel)
+        self.assertLess(object.validation.max_dev, 10**-DEC_P)
+        for k, g in enumerate(G):
+            state = core.tria(object.params._replace(G=g))
+            exp = np.round([state.B, state.phi, state.ent_pup_pos], DEC_P)
+            self.assertTrue(np.array_equal(np.round([views.B[k], views.phi[k], views.ent_pup_pos[k]], DEC_P), exp))
+        # pairs of arbitrary viewpoints
+        pairs = object.viewpoint_pairs(G1=G[::2], subpixel=subpixel)
+        self.assertEqual(pairs.B.shape, (G[::2].size,)*2)
+        self.assertTrue(np.allclose(pairs.B, -pairs.B.T) and np.allclose(pairs.phi, -pairs.phi.T))
+        pairs = object.viewpoint_pairs(G2=[0], subpixel=subpixel)
+        self.assertTrue(np.allclose(pairs.B[:, 0], -views.B) and np.array_equal(pairs.G1[:, 0], G))
+
+    @data((2000, [-6, 3], (-2, 2), .5, None), ('inf', 6, (-1, 3), .1, .05), (800, [-6, -1, 4], (0, 1), .25, .2))
+    @unpack
+    def test_depth_resolution(self, df, G, dx_range, step, tol):
+        # depth steps per disparity step for all viewpoint gaps at once
+        object = MainClass({'df': df})
+        res = object.depth_resolution(G, dx_range, step, tol=tol)
+        G = np.atleast_1d(G)
+        self.assertEqual(res.Z.shape, (G.size, res.dx.size))
+        self.assertEqual((res.dx[0], res.dx[-1]), dx_range)
+        # scalar triangulation as reference
+        for k, g in enumerate(G):
+            dx_all = np.append(res.dx, res.dx[-1]+step)
+            for i, dx in enumerate(res.dx):
+                Z, Z_next = [core.tria(object.params._replace(G=g, dx=val)).Z for val in dx_all[i:i+2]]
+                self.assertEqual(round(res.Z[k, i], DEC_P), round(Z, DEC_P))
+                self.assertTrue(np.allclose(res.dZ[k, i], Z_next-Z, equal_nan=True))
+            # summary figures
+            with np.errstate(invalid='ignore'):
+                Z_next = res.Z[k] + res.dZ[k]
+            mask = np.isfinite(res.Z[k]) & np.isfinite(Z_next) & (res.Z[k] > 0) & (Z_next > 0)
+            mask &= True if tol is None else res.rel[k] <= tol
+            self.assertEqual(res.planes[k], mask.sum())
+            self.assertTrue(np.array_equal(res.max_range[k], res.Z[k][mask].max() if mask.any() else np.nan,
+                                           equal_nan=True))
+        self.assertRaises(PlenoptisignError, object.depth_resolution, G, dx_range, 0)
+        self.assertRaises(PlenoptisignError, object.depth_resolution, G, dx_range[::-1], step)
+
+    @data([2000, 1, np.array([-1., 0., 1., 4.])], [np.inf, 3, np.array([[0.5], [2.]])])
+    @unpack
+    def test_uncertainty(self, df, G, dx):
+        # derivatives from central differences of the scalar engine per input
+        p = CameraParams.from_dict({'df': df, 'G': G})
+        a = np.array([-.5, 0, 1, 2])
+        for key in [key for key in uncertainty.KEYS + ('dx', 'a') if np.isfinite(getattr(p, key))]:
+            h = 1e-5*max(abs(getattr(p, key)), 1)
+            if key != 'a':
+                sig = uncertainty.tria_sigma(G, dx, {key: 1}, p)
+                self.assertEqual(sig.Z.shape, dx.shape)
+                for idx, val in np.ndenumerate(dx):
+                    q = p._replace(dx=val)
+                    ref = [core.tria(q._replace(**{key: getattr(q, key)+s*h}), validate=False).result for s in (1, -1)]
+                    ref = np.abs(np.subtract(*ref))/(2*h)
+                    self.assertTrue(np.allclose([sig.B[idx], sig.phi[idx], sig.Z[idx]], ref, rtol=1e-4, atol=1e-6,
+                                                equal_nan=True))
+            if key not in ('G', 'dx'):
+                sig = uncertainty.refo_sigma(a, {key: 1}, p)
+                for k, val in enumerate(a):
+                    q = p._replace(a=val)
+                    ref = [core.refo_analytic(q._replace(**{key: getattr(q, key)+s*h})).result for s in (1, -1)]
+                    with np.errstate(invalid='ignore'):
+                        ref = np.abs(np.subtract(*ref))/(2*h)
+                    # no deviation for infinite distances
+                    ref[~np.isfinite(core.refo_analytic(q).result)] = np.nan
+                    self.assertTrue(np.allclose([arr[k] for arr in sig], ref, rtol=1e-4, atol=1e-6, equal_nan=True))
+        self.assertRaises(PlenoptisignError, uncertainty.tria_sigma, G, dx, {'a': 1}, p)
+        self.assertRaises(PlenoptisignError, uncertainty.refo_sigma, a, {'dx': 1}, p)
+
+    @data(('fs', ('normal', 2.75, .01)), ('pm', ('uniform', .124, .126)), ('hh', ('lognormal', -.93, .01)),
+          ('dA', ('triangular', 110, 111, 112)), ('fU', ('normal', 193.2935, .5)), ('HH', ('normal', -65.5563, .5)))
+    @unpack
+    def test_montecarlo_params(self, key, dist):
+        # single parameter tolerances against sweep over the same samples
+        n, size = 500, 200
+        res = montecarlo.run({key: dist}, {'df': 2000}, n, seed=5, chunk_size=size)
+        seeds = np.random.SeedSequence(5).spawn(-(-n//size))
+        samples = [getattr(np.random.default_rng(s), dist[0])(*dist[1:], size=min(size, n-k*size))
+                   for k, s in enumerate(seeds)]
+        res_exp = sweep.run({key: np.concatenate(samples)}, {'df': 2000})
+        for field in RABB:
+            self.assertEqual(res[field].counts.sum(), n)
+            self.assertAlmostEqual(res[field].mean, res_exp[field].mean(), places=8)
+            self.assertEqual((res[field].min, res[field].max), (res_exp[field].min(), res_exp[field].max()))
+        for flag, count in res.flags.items():
+            self.assertEqual(count, np.count_nonzero(res_exp['flags'] & flag))
+        # usage example of MonteCarloResult
+        res = montecarlo.run({'fs': ('normal', 2.75, .01)}, n=10**4, seed=0)
+        self.assertEqual(res['d'].percentile([5, 50, 95]).shape, (3,))
+
+    @data((1000, 256, None, ('d', 'Z')), (777, 100, {'Z': (1690, 1700)}, None))
+    @unpack
+    def test_montecarlo(self, n, chunk_size, ranges, outputs):
+        # streaming summaries of tolerance samples
+        dists = {'fs': ('normal', 2.75, .01), 'pm': ('uniform', .124, .126), 'HH': ('triangular', -66, -65.5, -65)}
+        res = montecarlo.run(dists, {'df': 2000}, n, seed=3, chunk_size=chunk_size, outputs=outputs, ranges=ranges)
+        res_exp = montecarlo.run(dists, {'df': 2000}, n, seed=3, chunk_size=chunk_size, workers=2, outputs=outputs,
+                                 ranges=ranges)
+        # all samples of same generators as reference
+        seeds = np.random.SeedSequence(3).spawn(-(-n//chunk_size))
+        sizes = [min(chunk_size, n-start) for start in range(0, n, chunk_size)]
+        params = CameraParams.from_dict({'df': 2000}).to_dict()
+        for key in res.summaries:
+            vals = np.concatenate([montecarlo._sample_eval(params, dists, (key,), s, size)[0][key]
+                                   for s, size in zip(seeds, sizes)])
+            summary = res[key]
+            self.assertEqual(summary.counts.sum(), n)
+            self.assertTrue(np.array_equal(summary.counts, res_exp[key].counts))
+            self.assertAlmostEqual(summary.mean, vals.mean(), places=8)
+            self.assertAlmostEqual(summary.std, vals.std(), places=8)
+            if ranges and key in ranges:
+                self.assertEqual((summary.edges[0], summary.edges[-1]), ranges[key])
+            # percentiles within bin edges accurate to bin width
+            q = np.array([0, 5, 50, 95, 100])
+            ref = np.percentile(vals, q)
+            mask = (ref >= summary.edges[0]) & (ref <= summary.edges[-1]) | (q % 100 == 0)
+            err = np.abs(summary.percentile(q) - ref)[mask]
+            self.assertTrue(np.all(err <= summary.edges[1] - summary.edges[0]))
+        self.assertEqual(tuple(res.summaries), tuple(outputs or RABB))
+        self.assertRaises(PlenoptisignError, montecarlo.run, {'sd': ('normal', 1, 1)})
+        self.assertRaises(PlenoptisignError, montecarlo.run, {'fs': ('gamma', 1, 1)})
+
 
 if __name__ == '__main__':
     unittest.main()